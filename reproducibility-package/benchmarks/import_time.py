@@ -0,0 +1,53 @@
+"""Import-time benchmark for the CLI entry point and the provider SDKs.
+
+Every target is imported in a fresh interpreter `--repeat` times; the median wall time on top of a bare
+interpreter start is reported. `eager` imports everything main.py used to load up front (pandas and all
+three provider SDKs), so `eager - main` is what the lazy imports save per launch.
+
+    python benchmarks/import_time.py --repeat 10
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+TARGETS = {
+    "main": "import main",
+    "src.llm.factory": "import src.llm.factory",
+    "anthropic client": "import src.llm.antrhopic_client",
+    "openai client": "import src.llm.openai_client",
+    "ollama client": "import src.llm.ollama_client",
+    "pandas": "import pandas",
+    "eager": "import pandas, src.llm.antrhopic_client, src.llm.openai_client, src.llm.ollama_client, main",
+}
+
+
+def time_import(statement: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=ROOT_DIR, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = time_import("pass", args.repeat)
+    print(f"interpreter start: {baseline * 1000:8.1f} ms (subtracted below)")
+    results = {}
+    for name, statement in TARGETS.items():
+        results[name] = time_import(statement, args.repeat) - baseline
+        print(f"{name:<20} {results[name] * 1000:8.1f} ms")
+    print(f"{'saved per launch':<20} {(results['eager'] - results['main']) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
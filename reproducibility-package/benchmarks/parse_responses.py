@@ -0,0 +1,135 @@
+"""Micro-benchmark of LLM response parsing on the responses of a recorded run.
+
+The generator and judge responses are rebuilt from the trace logs of `outputs/<run>` and each one is
+also damaged the ways models damage JSON (code fence, prose around it or right after the closing
+brace, raw newlines in strings, trailing comma, smart quotes, unescaped inner quotes). Every variant is
+parsed `--repeat` times by the previous `LLMResponse.parse_json_as` logic and by
+`src.llm.structured_parser`; the success rate and mean time per response are reported, then the parse
+paths the new parser took.
+
+    python benchmarks/parse_responses.py --run 20250721_165915 --repeat 200
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from src.llm import structured_parser  # noqa: E402
+from src.models.llm_response_format import (  # noqa: E402
+    BuggyCodeGenerationResult, BuggyCodeIntentResult, BuggyScotResult, JudgeResult, PatchedCodeGenerationResult,
+    PatchedCodeIntentResult, PatchedFunctionalRequirementsResult, PatchedScotResult,
+)
+from src.utils.helper import strip_json_code_block  # noqa: E402
+
+# log name prefix -> (schema, {schema field: log column})
+GENERATOR_LOGS = {
+    "buggy_code_intent_judged": (BuggyCodeIntentResult, {"buggy_code_intent": "buggy_code_intent"}),
+    "buggy_scot_judged": (BuggyScotResult, {"buggy_scot": "buggy_scot"}),
+    "buggy_code_judged": (BuggyCodeGenerationResult, {"buggy_code": "buggy_code", "requirements": "requirements"}),
+    "patched_code_intent_judged": (PatchedCodeIntentResult, {"patched_code_intent": "patched_code_intent"}),
+    "patched_functional_requirements_judged": (PatchedFunctionalRequirementsResult,
+                                               {"functional_requirements": "patched_functional_requirements"}),
+    "patched_scot_judged": (PatchedScotResult, {"patched_scot": "patched_scot"}),
+    "patched_code_judged": (PatchedCodeGenerationResult,
+                            {"patched_code": "patched_code", "requirements": "requirements"}),
+}
+
+_RAW = {"n": "\n", "t": "\t"}
+
+VARIANTS = {
+    "clean": lambda text: text,
+    "fenced": lambda text: f"```json\n{text}\n```",
+    "prose": lambda text: f"Here is the JSON you asked for:\n```json\n{text}\n```\nLet me know if you need more.",
+    # prose on the same line as the closing brace must not end up in the last field
+    "trailing_prose": lambda text: f"{text} Hope this helps!",
+    # escape pairs are consumed left to right so an escaped backslash before an "n" stays intact
+    "raw_newlines": lambda text: re.sub(r"\\(.)", lambda m: _RAW.get(m.group(1), m.group(0)), text),
+    "trailing_comma": lambda text: text[:-1] + ",}",
+    "smart_quotes": lambda text: re.sub(r'"(\w+)":', r"“\1”:", text),
+    "inner_quotes": lambda text: text.replace('\\"', '"'),
+}
+
+
+def legacy_parse(content: str, schema_cls):
+    """`LLMResponse.parse_json_as` before the structured parser, without the printing."""
+    content = strip_json_code_block(content.strip())
+    try:
+        return schema_cls.model_validate_json(content)
+    except Exception:
+        pass
+    result = {}
+    for field_name in schema_cls.model_fields:
+        regex = rf'"{re.escape(field_name)}"\s*:\s*(?:"([\s\S]*?)"|([\w\.\-]+))'
+        match = re.search(regex, content)
+        if not match:
+            continue
+        value = match.group(1)
+        if field_name not in {"buggy_code", "patched_code", "requirements"}:
+            value = re.sub(r"[\x00-\x1F\x7F]", "", value).strip()
+        result[field_name] = value
+    return schema_cls.model_validate(result)
+
+
+def load_responses(run_dir: Path) -> list:
+    """(schema, expected fields, response JSON) for every generator and judge response of the run."""
+    csv.field_size_limit(sys.maxsize)
+    responses = []
+    for path in sorted(run_dir.glob("stack_overflow/logs/*.csv")):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        for prefix, (schema_cls, columns) in GENERATOR_LOGS.items():
+            if path.name.startswith(prefix + "_"):
+                for row in rows:
+                    fields = {field: row[column] for field, column in columns.items()}
+                    responses.append((schema_cls, fields, json.dumps(fields, ensure_ascii=False)))
+        for row in rows:
+            label = next((column for column in row if column.endswith("_label")), None)
+            rationale = next((column for column in row if re.search(r"_rationa?le?$", column)), None)
+            if label and rationale:
+                fields = {"label": row[label], "rationale": row[rationale]}
+                responses.append((JudgeResult, fields, json.dumps(fields, ensure_ascii=False)))
+    return responses
+
+
+def run(parse, cases: list, repeat: int) -> tuple:
+    correct = 0
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for schema_cls, expected, text in cases:
+            for _ in range(repeat):
+                try:
+                    parsed = parse(text, schema_cls)
+                except ValueError:
+                    continue
+                correct += parsed.model_dump() == expected
+    elapsed = time.perf_counter() - start
+    return correct / (len(cases) * repeat), elapsed / (len(cases) * repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--run", default="20250721_165915", help="run under outputs/ to take the responses from")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    responses = load_responses(ROOT_DIR / "outputs" / args.run)
+    print(f"{len(responses)} recorded responses from outputs/{args.run}")
+    print(f"{'variant':<16} {'legacy ok':>10} {'legacy us':>10} {'parser ok':>10} {'parser us':>10}")
+    for name, damage in VARIANTS.items():
+        cases = [(schema_cls, expected, damage(text)) for schema_cls, expected, text in responses]
+        legacy_ok, legacy_time = run(legacy_parse, cases, args.repeat)
+        parser_ok, parser_time = run(structured_parser.parse_as, cases, args.repeat)
+        print(f"{name:<16} {legacy_ok:>10.0%} {legacy_time * 1e6:>10.1f} {parser_ok:>10.0%} {parser_time * 1e6:>10.1f}")
+    print(f"parse paths: {structured_parser.stats.summary()}")
+
+
+if __name__ == "__main__":
+    main()
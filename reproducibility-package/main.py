@@ -1,145 +1,251 @@
+import argparse
 import traceback
 from datetime import datetime
 from pathlib import Path
 import time
-from time import sleep
 
 from dotenv import load_dotenv
-import pandas as pd
-from src.config.loader import ConfigLoader
+from src.config.registry import get_config, loaded_examples
+from src.llm.cached_client import CachedLLMClient
 from src.llm.factory import ModelFactory
+from src.llm import streaming, structured_parser
+from src.pipeline import speculation
 from src.pipeline.buggy_code_generation_pipeline import BuggyCodeGenerationPipeline
 from src.pipeline.patched_code_generation_pipeline import PatchedCodeGenerationPipeline
+from src.pipeline.staged_post_pipeline import PostJob, StagedPostPipeline
 from src.utils.csv_logger import CsvTraceLogger
-
-load_dotenv()
-cfg = ConfigLoader()
-timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-data_path = "./dataset/motivating_example.csv"
-dataset = pd.read_csv(data_path)
-
-generator_model_name = cfg.get("generator_llm")
-generator_llm = ModelFactory(cfg, model_name=generator_model_name).get_model_client()
-
-judge_llm_name = cfg.get("judge_llm")
-judge_llm = ModelFactory(cfg, model_name=judge_llm_name).get_model_client()
-
-# logging
-output_path = cfg.root_dir / f"outputs/{timestamp}"
-
-buggy_code_intent_logger = CsvTraceLogger(
-    Path(output_path),
-    timestamp=timestamp,
-    schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_buggy_code_intent_csv_schema.json"),
-    filename=f"buggy_code_intent_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv"
-)
-
-buggy_functional_requirements_logger = CsvTraceLogger(
-    Path(output_path),
-    timestamp=timestamp,
-    schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_buggy_functional_requirements_csv_schema.json"),
-    filename=f"buggy_functional_requirements_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv"
-)
-
-buggy_scot_logger = CsvTraceLogger(
-    Path(output_path),
-    timestamp=timestamp,
-    schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_buggy_scot_csv_schema.json"),
-    filename=f"buggy_scot_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv"
-)
-
-# todo: check usage and handle accordingly
-buggy_code_logger = CsvTraceLogger(
-    Path(output_path),
-    timestamp=timestamp,
-    schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_buggy_code_csv_schema.json"),
-    filename=f"buggy_code_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv"
-)
-
-patched_code_intent_logger = CsvTraceLogger(
-    Path(output_path),
-    timestamp=timestamp,
-    schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_patched_code_intent_csv_schema.json"),
-    filename=f"patched_code_intent_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv"
-)
-
-patched_functional_requirements_logger = CsvTraceLogger(
-    Path(output_path),
-    timestamp=timestamp,
-    schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_patched_functional_requirements_csv_schema.json"),
-    filename=f"patched_functional_requirements_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv"
-)
-
-patched_scot_logger = CsvTraceLogger(
-    Path(output_path),
-    timestamp=timestamp,
-    schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_patched_scot_csv_schema.json"),
-    filename=f"patched_scot_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv"
-)
-
-# todo: check usage and handle accordingly
-patched_code_logger = CsvTraceLogger(
-    Path(output_path),
-    timestamp=timestamp,
-    schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_patched_code_csv_schema.json"),
-    filename=f"patched_code_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv"
-)
-
-time_logger = CsvTraceLogger(
-    Path(output_path),
-    timestamp=timestamp,
-    schema_path=cfg.root_dir / Path("src/csv_schema/other/time_log_csv_schema.json"),
-    filename=f"post_exec_time_{generator_model_name}_{judge_llm_name}_{timestamp}.csv"
-)
-
-loggers = {
-    "buggy_code_intent_logger": buggy_code_intent_logger,
-    "buggy_functional_requirements_logger": buggy_functional_requirements_logger,
-    "buggy_scot_logger": buggy_scot_logger,
-    "buggy_code_logger": buggy_code_logger,
-    "patched_code_intent_logger": patched_code_intent_logger,
-    "patched_functional_requirements_logger": patched_functional_requirements_logger,
-    "patched_scot_logger": patched_scot_logger,
-    "patched_code_logger": patched_code_logger,
-}
-try:
-    buggy_code_generator_pipeline = BuggyCodeGenerationPipeline(generator_llm, judge_llm, loggers)
-    patched_code_generator_pipeline = PatchedCodeGenerationPipeline(generator_llm, judge_llm, loggers)
-
-    for i, (idx, post) in enumerate(dataset.iterrows()):
-        try:
-            print("=" * 50)
-            question_id = post["question_id"]
-            print(f"[{generator_model_name}][{idx + 1}/{len(dataset)}] Starting {question_id}...")
-            start_time = time.time()
-            buggy_code_generation, buggy_code_judgement = buggy_code_generator_pipeline.run(post)
-            if isinstance(buggy_code_judgement, dict):
-                buggy_code_label = buggy_code_judgement.get("label", "").lower()
-            else:
-                buggy_code_label = buggy_code_judgement.label.lower()
-
-            if buggy_code_label != "correct":
+from src.utils.run_journal import RunJournal
+from src.utils.run_store import RunStore, RunStoreLogger, TeeTraceLogger
+from src.validator.cached_validator import CachedValidator
+from src.validator.factory import validator_layers
+from src.validator.preflight import PreflightValidator
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate buggy and patched code for the Stack Overflow posts.")
+    parser.add_argument("--resume", metavar="RUN",
+                        help="timestamp of an interrupted run (outputs/<RUN>) to continue instead of starting a new one")
+    return parser, parser.parse_args(argv)
+
+
+def main(argv=None):
+    parser, args = parse_args(argv)
+
+    load_dotenv()
+    cfg = get_config()
+    if args.resume:
+        timestamp = args.resume
+        if not (cfg.root_dir / f"outputs/{timestamp}").is_dir():
+            parser.error(f"no run to resume at outputs/{timestamp}")
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    import pandas as pd  # deferred so that importing this module and --help stay fast
+
+    data_path = "./dataset/motivating_example.csv"
+    dataset = pd.read_csv(data_path)
+
+    generator_model_name = cfg.get("generator_llm")
+    generator_llm = ModelFactory(cfg, model_name=generator_model_name).get_model_client()
+
+    judge_llm_name = cfg.get("judge_llm")
+    judge_llm = ModelFactory(cfg, model_name=judge_llm_name).get_model_client()
+
+    # logging
+    output_path = cfg.root_dir / f"outputs/{timestamp}"
+    log_options = dict(
+        flush_rows=cfg.get("logging").flush_rows,
+        flush_interval=cfg.get("logging").flush_interval,
+    )
+    if cfg.get("logging").get("sink", "csv") == "parquet":
+        from src.utils.parquet_logger import ParquetTraceLogger as TraceLogger
+    else:
+        TraceLogger = CsvTraceLogger
+
+    buggy_code_intent_logger = TraceLogger(
+        Path(output_path),
+        timestamp=timestamp,
+        schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_buggy_code_intent_csv_schema.json"),
+        filename=f"buggy_code_intent_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv",
+        **log_options
+    )
+
+    buggy_functional_requirements_logger = TraceLogger(
+        Path(output_path),
+        timestamp=timestamp,
+        schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_buggy_functional_requirements_csv_schema.json"),
+        filename=f"buggy_functional_requirements_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv",
+        **log_options
+    )
+
+    buggy_scot_logger = TraceLogger(
+        Path(output_path),
+        timestamp=timestamp,
+        schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_buggy_scot_csv_schema.json"),
+        filename=f"buggy_scot_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv",
+        **log_options
+    )
+
+    # todo: check usage and handle accordingly
+    buggy_code_logger = TraceLogger(
+        Path(output_path),
+        timestamp=timestamp,
+        schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_buggy_code_csv_schema.json"),
+        filename=f"buggy_code_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv",
+        **log_options
+    )
+
+    patched_code_intent_logger = TraceLogger(
+        Path(output_path),
+        timestamp=timestamp,
+        schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_patched_code_intent_csv_schema.json"),
+        filename=f"patched_code_intent_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv",
+        **log_options
+    )
+
+    patched_functional_requirements_logger = TraceLogger(
+        Path(output_path),
+        timestamp=timestamp,
+        schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_patched_functional_requirements_csv_schema.json"),
+        filename=f"patched_functional_requirements_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv",
+        **log_options
+    )
+
+    patched_scot_logger = TraceLogger(
+        Path(output_path),
+        timestamp=timestamp,
+        schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_patched_scot_csv_schema.json"),
+        filename=f"patched_scot_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv",
+        **log_options
+    )
+
+    # todo: check usage and handle accordingly
+    patched_code_logger = TraceLogger(
+        Path(output_path),
+        timestamp=timestamp,
+        schema_path=cfg.root_dir / Path("src/csv_schema/judge/judge_patched_code_csv_schema.json"),
+        filename=f"patched_code_judged_{generator_model_name}_{judge_llm_name}_{timestamp}.csv",
+        **log_options
+    )
+
+    time_logger = TraceLogger(
+        Path(output_path),
+        timestamp=timestamp,
+        schema_path=cfg.root_dir / Path("src/csv_schema/other/time_log_csv_schema.json"),
+        filename=f"post_exec_time_{generator_model_name}_{judge_llm_name}_{timestamp}.csv",
+        **log_options
+    )
+
+    loggers = {
+        "buggy_code_intent_logger": buggy_code_intent_logger,
+        "buggy_functional_requirements_logger": buggy_functional_requirements_logger,
+        "buggy_scot_logger": buggy_scot_logger,
+        "buggy_code_logger": buggy_code_logger,
+        "patched_code_intent_logger": patched_code_intent_logger,
+        "patched_functional_requirements_logger": patched_functional_requirements_logger,
+        "patched_scot_logger": patched_scot_logger,
+        "patched_code_logger": patched_code_logger,
+    }
+
+    run_store = None
+    run_store_cfg = cfg.get("run_store")
+    if run_store_cfg is not None and run_store_cfg.get("enabled", False):
+        run_store = RunStore(cfg.root_dir / run_store_cfg.path)
+        run_store.start_run(timestamp, generator_model_name, judge_llm_name, dataset=data_path)
+        loggers = {
+            name: TeeTraceLogger(logger, RunStoreLogger(run_store, timestamp, name[:-len("_logger")]))
+            for name, logger in loggers.items()
+        }
+        time_logger = TeeTraceLogger(time_logger, RunStoreLogger(run_store, timestamp, "post_exec_time"))
+
+    # completed stages of every post, replayed by --resume
+    journal = RunJournal(Path(output_path) / "journal.jsonl", loggers=[*loggers.values(), time_logger])
+
+    def pending_posts():
+        for idx, post in dataset.iterrows():
+            checkpoint = journal.checkpoint(post["question_id"])
+            if "post_done" in checkpoint:
+                print(f"[RESUME] Skipping {post['question_id']}, already completed")
                 continue
-
-            post['buggy_code'] = buggy_code_generation.buggy_code
-
-            patched_code_generation, patched_code_judgement = patched_code_generator_pipeline.run(post)
-
-        except Exception as e:
-            print("error:", str(e))
-            traceback.print_exc()
-            continue
-        finally:
-            # Always log time, even if skipped or failed
-            end_time = time.time()
-            elapsed = round(end_time - start_time, 2)
-            time_logger.append_row(
-                question_id=question_id,
-                exec_time=elapsed,
-            )
-            print(f"[Post {question_id}] Time taken: {elapsed} seconds")
-except Exception as e:
-    print("error:", str(e))
-    traceback.print_exc()
-
+            # each post gets its own copy of the row (and its own message history inside the agents)
+            yield PostJob(idx, post.copy(), checkpoint)
+
+    def start_post(job):
+        job.start_time = time.time()
+        print("=" * 50)
+        print(f"[{generator_model_name}][{job.idx + 1}/{len(dataset)}] Starting {job.question_id}...")
+        if run_store is not None:
+            run_store.add_post(job.question_id, job.post["question"], job.post.get("answer"))
+
+    def finish_post(job, error):
+        if error is not None:
+            print(f"[Post {job.question_id}] error:", str(error))
+            traceback.print_exception(error)
+        # Always log time, even if failed
+        elapsed = round(time.time() - job.start_time, 2)
+        time_logger.append_row(
+            question_id=job.question_id,
+            exec_time=elapsed,
+        )
+        print(f"[Post {job.question_id}] Time taken: {elapsed} seconds")
+
+    try:
+        buggy_code_generator_pipeline = BuggyCodeGenerationPipeline(generator_llm, judge_llm, loggers,
+                                                                    journal=journal)
+        patched_code_generator_pipeline = PatchedCodeGenerationPipeline(generator_llm, judge_llm, loggers,
+                                                                        journal=journal)
+
+        # thoughts, code generation, validation and review run in their own worker pools, so posts overlap
+        execution_cfg = cfg.get("execution")
+        staged_pipeline = StagedPostPipeline(
+            buggy_code_generator_pipeline, patched_code_generator_pipeline, journal=journal,
+            workers=dict(execution_cfg.get("workers") or {}),
+            max_in_flight=execution_cfg.get("max_in_flight", 8),
+            report_interval=execution_cfg.get("report_interval", 0),
+        )
+        print(f"[INFO] Processing {len(dataset)} posts, up to {staged_pipeline.runner.max_in_flight} in flight")
+        staged_pipeline.run(pending_posts(), on_admit=start_post, on_done=finish_post)
+        # waits for speculative candidates that were still running when their post moved on
+        buggy_code_generator_pipeline.close()
+        patched_code_generator_pipeline.close()
+
+        for logger in [*loggers.values(), time_logger]:
+            logger.close()
+        journal.close()
+        if run_store is not None:
+            run_store.close()
+
+        for llm_name, llm in ((generator_model_name, generator_llm), (judge_llm_name, judge_llm)):
+            if isinstance(llm, CachedLLMClient):
+                print(f"[INFO] LLM cache [{llm_name}]: {llm.hits} hits, {llm.misses} misses")
+        for examples in loaded_examples().values():
+            if examples.calls:
+                saved = examples.calls * examples.total_tokens - examples.tokens_sent
+                print(f"[INFO] Few-shot [{examples.name}]: {examples.calls} calls, "
+                      f"~{examples.tokens_sent // examples.calls} example tokens per call, ~{saved} tokens saved")
+        print(f"[INFO] Response parsing: {structured_parser.stats.summary()}")
+        for source in sorted(structured_parser.stats.by_source, key=str):
+            print(f"[INFO] Response parsing [{source}]: {structured_parser.stats.summary(source)}, "
+                  f"{structured_parser.stats.failures(source)} parse failures")
+        for model in streaming.stats.models():
+            print(f"[INFO] Streaming [{model}]: {streaming.stats.summary(model)}")
+        for pipeline in (buggy_code_generator_pipeline, patched_code_generator_pipeline):
+            for validator in validator_layers(pipeline.validator):
+                if isinstance(validator, PreflightValidator):
+                    print(f"[INFO] Pre-flight [{pipeline.LOOP_NAME}]: {validator.summary()}")
+                elif isinstance(validator, CachedValidator):
+                    print(f"[INFO] Execution cache [{pipeline.LOOP_NAME}]: {validator.hits} hits, "
+                          f"{validator.misses} misses ({validator.hit_rate():.0%} hit rate)")
+        if patched_code_generator_pipeline.benchmark_config.get("enabled", False):
+            print(f"[INFO] Benchmark: {patched_code_generator_pipeline.benchmark_summary()}")
+        for loop_name in speculation.stats.loops():
+            print(f"[INFO] Speculation [{loop_name}]: {speculation.stats.summary(loop_name)}")
+        for stage, summary in staged_pipeline.runner.summary().items():
+            print(f"[INFO] Stage [{stage}]: {summary}")
+    except Exception as e:
+        print("error:", str(e))
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,27 @@
+import json
 from abc import ABC, abstractmethod
 from typing import Any
 
+from src.utils.helper import estimate_message_tokens, trim_messages
+
 
 class BaseAgent(ABC):
+    # refinement prompts resend the script and its stderr every round; beyond these (estimated) sizes
+    # their middle is cut out
+    STDERR_MAX_TOKENS = 1500
+    CODE_MAX_TOKENS = 6000
 
     def __init__(self, name: str):
         self.name = name
+
+    def trim_history(self, messages: list[dict], max_pairs: int = 2) -> list[dict]:
+        # the model profile's context_budget (if any) caps the estimated prompt tokens on top of max_pairs
+        return trim_messages(messages, max_pairs, max_tokens=getattr(self.llm_client, "context_budget", None))
+
+    @staticmethod
+    def usage_json(response, examples: list[dict] = None) -> str:
+        """Token usage of a call as logged in the traces, with the estimated tokens of its few-shot examples."""
+        usage = dict(response.token_usage or {})
+        if examples is not None:
+            usage["few_shot_tokens"] = estimate_message_tokens(examples)
+        return json.dumps(usage, indent=2)
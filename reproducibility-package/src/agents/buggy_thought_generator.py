@@ -1,14 +1,10 @@
 import json
-from pathlib import Path
 
 from src.agents.base_agent import BaseAgent
-from src.config.loader import ConfigLoader
+from src.config.registry import get_examples, get_prompt
 from src.llm.base import LLMClient
 
-from src.llm.prompt_loader import PromptLoader
 from src.models.llm_response_format import BuggyCodeIntentResult, BuggyFunctionalRequirementsResult, BuggyScotResult
-from src.utils.helper import trim_messages
-from src.utils.utils import Utils
 
 
 class BuggyThoughtGeneratorAgent(BaseAgent):
@@ -17,28 +13,17 @@ class BuggyThoughtGeneratorAgent(BaseAgent):
                  ):
         super().__init__("BuggyThoughtGenerator")
         self.llm_client = llm_client
-        cfg = ConfigLoader()
-        prompt_loader = PromptLoader(cfg.prompt_dir)
-        self.buggy_code_intent_prompt = prompt_loader.load("thought_generation/buggy/buggy_code_intent_generator.yaml")
-        self.buggy_functional_requirements_prompt = prompt_loader.load(
+        self.buggy_code_intent_prompt = get_prompt("thought_generation/buggy/buggy_code_intent_generator.yaml")
+        self.buggy_functional_requirements_prompt = get_prompt(
             "thought_generation/buggy/buggy_functional_requirements_generator.yaml")
-        self.buggy_scot_prompt = prompt_loader.load("thought_generation/buggy/buggy_scot_generator.yaml")
+        self.buggy_scot_prompt = get_prompt("thought_generation/buggy/buggy_scot_generator.yaml")
 
         # examples
-        buggy_code_intent_examples_path = cfg.root_dir / Path(
-            "src/prompts/thought_generation/buggy/buggy_code_intent_examples.json")
-        with open(buggy_code_intent_examples_path, "r") as f:
-            self.buggy_code_intent_examples = json.load(f)
-
-        buggy_functional_requirements_examples_path = cfg.root_dir / Path(
-            "src/prompts/thought_generation/buggy/buggy_functional_requirements_examples.json")
-        with open(buggy_functional_requirements_examples_path, "r") as f:
-            self.buggy_functional_requirements_examples = json.load(f)
-
-        buggy_scot_examples_path = cfg.root_dir / Path(
-            "src/prompts/thought_generation/buggy/buggy_scot_examples.json")
-        with open(buggy_scot_examples_path, "r") as f:
-            self.buggy_scot_examples = json.load(f)
+        self.buggy_code_intent_examples = get_examples(
+            "thought_generation/buggy/buggy_code_intent_examples.json")
+        self.buggy_functional_requirements_examples = get_examples(
+            "thought_generation/buggy/buggy_functional_requirements_examples.json")
+        self.buggy_scot_examples = get_examples("thought_generation/buggy/buggy_scot_examples.json")
 
     def generate_buggy_code_intent(self, question: str):
         system_prompt = self.buggy_code_intent_prompt["system_prompt"]
@@ -46,7 +31,7 @@ class BuggyThoughtGeneratorAgent(BaseAgent):
         messages = [{"role": "system", "content": system_prompt}]
         user_prompt = prompt_template.format(question=question)
 
-        filtered_examples = Utils.remove_duplicate_example(self.buggy_code_intent_examples, question)
+        filtered_examples = self.buggy_code_intent_examples.filter(question)
         messages.extend(filtered_examples)
 
         messages.append({"role": "user", "content": user_prompt})
@@ -55,7 +40,7 @@ class BuggyThoughtGeneratorAgent(BaseAgent):
         messages.append({"role": "assistant", "content": response.message.content})
 
         parsed = response.parse_json_as(BuggyCodeIntentResult)
-        return messages, parsed.buggy_code_intent, json.dumps(response.token_usage, indent=2)
+        return messages, parsed.buggy_code_intent, self.usage_json(response, filtered_examples)
 
     def refine_buggy_code_intent(self, messages, result):
         label = result.label
@@ -63,8 +48,8 @@ class BuggyThoughtGeneratorAgent(BaseAgent):
         prompt_template = self.buggy_code_intent_prompt['refine']
         refinement_prompt = prompt_template.format(label=label, rationale=rationale)
 
-        messages = trim_messages(messages, 2)
         messages.append({"role": "user", "content": refinement_prompt})
+        messages = self.trim_history(messages)
 
         response = self.llm_client.call(messages=messages, response_format=BuggyCodeIntentResult)
         messages.append({"role": "assistant", "content": response.message.content})
@@ -77,7 +62,7 @@ class BuggyThoughtGeneratorAgent(BaseAgent):
         prompt_template = self.buggy_functional_requirements_prompt['task']
 
         messages = [{"role": "system", "content": system_prompt}]
-        filtered_examples = Utils.remove_duplicate_example(self.buggy_functional_requirements_examples, question)
+        filtered_examples = self.buggy_functional_requirements_examples.filter(question)
         messages.extend(filtered_examples)
 
         user_prompt = prompt_template.format(question=question)
@@ -89,7 +74,7 @@ class BuggyThoughtGeneratorAgent(BaseAgent):
         # parsed = response.parse_json_as(BuggyFunctionalRequirementsResult)
         # return messages, json.dumps(parsed.functional_requirements.dict(), indent=2), json.dumps(response.token_usage,
         #                                                                                          indent=2)
-        return messages, response.message.content, json.dumps(response.token_usage, indent=2)
+        return messages, response.message.content, self.usage_json(response, filtered_examples)
 
     def refine_buggy_functional_requirements(self, messages, result):
         label = result.label
@@ -97,8 +82,8 @@ class BuggyThoughtGeneratorAgent(BaseAgent):
 
         prompt_template = self.buggy_functional_requirements_prompt['refine']
         refinement_prompt = prompt_template.format(label=label, rationale=rationale)
-        messages = trim_messages(messages, 2)
         messages.append({"role": "user", "content": refinement_prompt})
+        messages = self.trim_history(messages)
 
         response = self.llm_client.call(messages=messages, response_format=BuggyFunctionalRequirementsResult)
         messages.append({"role": "assistant", "content": response.message.content})
@@ -113,7 +98,7 @@ class BuggyThoughtGeneratorAgent(BaseAgent):
         prompt_template = self.buggy_scot_prompt['task']
 
         messages = [{"role": "system", "content": system_prompt}]
-        filtered_examples = Utils.remove_duplicate_example(self.buggy_scot_examples, question)
+        filtered_examples = self.buggy_scot_examples.filter(question)
         messages.extend(filtered_examples)
 
         user_prompt = prompt_template.format(question=question)
@@ -124,7 +109,7 @@ class BuggyThoughtGeneratorAgent(BaseAgent):
 
         messages.append({"role": "assistant", "content": response.message.content})
 
-        return messages, parsed.buggy_scot, json.dumps(response.token_usage, indent=2)
+        return messages, parsed.buggy_scot, self.usage_json(response, filtered_examples)
 
     def refine_buggy_scot(self, messages, result):
         label = result.label
@@ -132,8 +117,8 @@ class BuggyThoughtGeneratorAgent(BaseAgent):
 
         prompt_template = self.buggy_scot_prompt['refine']
         refinement_prompt = prompt_template.format(label=label, rationale=rationale)
-        messages = trim_messages(messages, 2)
         messages.append({"role": "user", "content": refinement_prompt})
+        messages = self.trim_history(messages)
 
         response = self.llm_client.call(messages=messages, response_format=BuggyScotResult)
         parsed = response.parse_json_as(BuggyScotResult)
@@ -0,0 +1,69 @@
+import json
+import threading
+from pathlib import Path
+from types import MappingProxyType
+
+from omegaconf import OmegaConf
+
+from src.config.loader import ConfigLoader
+from src.llm.prompt_loader import PromptLoader
+from src.utils.few_shot import FewShotIndex
+
+# process-wide, filled on first use and read-only afterwards, so every agent, pipeline and worker
+# thread shares one parsed copy of the config, the prompt templates and the few-shot examples
+_lock = threading.RLock()
+_config = None
+_prompts = {}
+_examples = {}
+
+
+def get_config() -> ConfigLoader:
+    global _config
+    if _config is None:
+        with _lock:
+            if _config is None:
+                config = ConfigLoader()
+                OmegaConf.set_readonly(config.config, True)
+                _config = config
+    return _config
+
+
+def get_prompt(relative_path: str) -> MappingProxyType:
+    """Prompt YAML under src/prompts/, as a read-only mapping."""
+    prompt = _prompts.get(relative_path)
+    if prompt is None:
+        with _lock:
+            prompt = _prompts.get(relative_path)
+            if prompt is None:
+                prompt = MappingProxyType(PromptLoader(get_config().prompt_dir).load(relative_path))
+                _prompts[relative_path] = prompt
+    return prompt
+
+
+def _selection_options(name: str) -> dict:
+    few_shot = get_config().get("few_shot")
+    if few_shot is None or not few_shot.get("enabled", False):
+        return {}
+    options = {"top_k": few_shot.get("top_k"), "token_budget": few_shot.get("token_budget")}
+    options.update((few_shot.get("stages") or {}).get(name) or {})
+    return options
+
+
+def loaded_examples() -> dict:
+    with _lock:
+        return dict(_examples)
+
+
+def get_examples(relative_path: str) -> FewShotIndex:
+    """Few-shot JSON under src/prompts/, indexed for duplicate filtering."""
+    examples = _examples.get(relative_path)
+    if examples is None:
+        with _lock:
+            examples = _examples.get(relative_path)
+            if examples is None:
+                with open(get_config().prompt_dir / relative_path, "r") as f:
+                    messages = json.load(f)
+                name = Path(relative_path).stem
+                examples = FewShotIndex(messages, name=name, **_selection_options(name))
+                _examples[relative_path] = examples
+    return examples
@@ -1,7 +1,10 @@
+import json
+
 import anthropic
 from pprint import pprint
-from src.llm.base import LLMClient
+from src.llm.base import LLMClient, inline_json_schema
 from src.llm.response_format import LLMResponse, AssistantMessage
+from src.llm.streaming import StreamCollector, finish_stream
 
 
 class AnthropicClient(LLMClient):
@@ -10,22 +13,84 @@ class AnthropicClient(LLMClient):
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.client = anthropic.Anthropic(api_key=api_key)
+        self.async_client = anthropic.AsyncAnthropic(api_key=api_key)
 
-    def call(self, messages: list[dict], **kwargs) -> LLMResponse:
+    def _request(self, messages: list[dict], **kwargs) -> dict:
         system_message = ""
         if messages and messages[0]["role"] == "system":
             system_message = messages[0]["content"]
             messages = messages[1:]  # remove the top system message
 
-        llm_response = self.client.messages.create(
+        request = dict(
             model=self.model,
             max_tokens=self.max_tokens,
-            temperature=self.temperature,
+            temperature=kwargs.get("temperature", self.temperature),  # no seed parameter in this API
             system=system_message,
             messages=messages,
         )
+        schema_cls = self.response_schema(kwargs)
+        if schema_cls is not None:
+            # structured output: the model has to answer by calling a tool whose input is the response schema
+            request["tools"] = [{
+                "name": schema_cls.__name__,
+                "description": f"Return the answer as a {schema_cls.__name__} object.",
+                "input_schema": inline_json_schema(schema_cls),
+            }]
+            request["tool_choice"] = {"type": "tool", "name": schema_cls.__name__}
+        return request
+
+    def call(self, messages: list[dict], **kwargs) -> LLMResponse:
+        if self.stream:
+            return self._stream(self._request(messages, **kwargs), messages, self.expects_json(kwargs))
+        llm_response = self.client.messages.create(**self._request(messages, **kwargs))
+        return self._to_llm_response(llm_response)
+
+    async def acall(self, messages: list[dict], **kwargs) -> LLMResponse:
+        if self.stream:
+            return await self._astream(self._request(messages, **kwargs), messages, self.expects_json(kwargs))
+        llm_response = await self.async_client.messages.create(**self._request(messages, **kwargs))
+        return self._to_llm_response(llm_response)
+
+    def _stream(self, request: dict, messages: list[dict], stop_on_json: bool) -> LLMResponse:
+        # a forced tool call ends with its input object, only free-text answers can ramble past the JSON
+        collector = StreamCollector(stop_on_json and "tools" not in request)
+        input_tokens = None
+        with self.client.messages.stream(**request) as stream:
+            for event in stream:
+                if event.type == "message_start":
+                    input_tokens = event.message.usage.input_tokens
+                elif event.type in ("text", "input_json"):
+                    if collector.feed(event.text if event.type == "text" else event.partial_json):
+                        break
+            else:
+                response = self._to_llm_response(stream.get_final_message())
+                return finish_stream(collector, messages, self.model, response.token_usage,
+                                     response.message.content, response.raw)
+        return finish_stream(collector, messages, self.model, input_tokens=input_tokens)
+
+    async def _astream(self, request: dict, messages: list[dict], stop_on_json: bool) -> LLMResponse:
+        collector = StreamCollector(stop_on_json and "tools" not in request)
+        input_tokens = None
+        async with self.async_client.messages.stream(**request) as stream:
+            async for event in stream:
+                if event.type == "message_start":
+                    input_tokens = event.message.usage.input_tokens
+                elif event.type in ("text", "input_json"):
+                    if collector.feed(event.text if event.type == "text" else event.partial_json):
+                        break
+            else:
+                response = self._to_llm_response(await stream.get_final_message())
+                return finish_stream(collector, messages, self.model, response.token_usage,
+                                     response.message.content, response.raw)
+        return finish_stream(collector, messages, self.model, input_tokens=input_tokens)
 
-        content = llm_response.content[0].text
+    @staticmethod
+    def _to_llm_response(llm_response) -> LLMResponse:
+        tool_input = next((block.input for block in llm_response.content if block.type == "tool_use"), None)
+        if tool_input is not None:
+            content = json.dumps(tool_input, ensure_ascii=False, indent=2)
+        else:
+            content = next((block.text for block in llm_response.content if block.type == "text"), "")
 
         usage = getattr(llm_response, "usage", {})
         token_usage = {
@@ -40,5 +105,6 @@ class AnthropicClient(LLMClient):
         return LLMResponse(
             message=AssistantMessage(content=content),
             token_usage=token_usage,
+            model=getattr(llm_response, "model", None),
             raw=llm_response.model_dump() if hasattr(llm_response, "model_dump") else llm_response.dict()
         )
@@ -1,8 +1,51 @@
+import asyncio
 from abc import ABC, abstractmethod
+from functools import lru_cache
 from typing import Any
 
+from pydantic import BaseModel
+
 
 class LLMClient(ABC):
+    # ask the provider to constrain the output to the response schema (profile option `structured_output`)
+    structured_output = True
+    # stream completions, recording TTFT and tokens/s and closing the stream after the JSON answer (`stream`)
+    stream = False
+
     @abstractmethod
     def call(self, messages: Any, response_format=Any):
         pass
+
+    async def acall(self, messages: Any, **kwargs):
+        # not used by the agents and pipelines yet, they still run call() on the stage worker threads
+        # clients without a native async transport fall back to running the blocking call in a thread
+        return await asyncio.to_thread(self.call, messages, **kwargs)
+
+    @staticmethod
+    def expects_json(kwargs: dict) -> bool:
+        return bool(kwargs.get("response_format") or kwargs.get("format"))
+
+    def response_schema(self, kwargs: dict):
+        """Pydantic response schema of a call (`response_format=` or the older `format=`), if it should be enforced."""
+        schema_cls = kwargs.get("response_format") or kwargs.get("format")
+        if self.structured_output and isinstance(schema_cls, type) and issubclass(schema_cls, BaseModel):
+            return schema_cls
+        return None
+
+
+@lru_cache(maxsize=None)
+def inline_json_schema(schema_cls: type) -> dict:
+    """JSON schema of a pydantic model with its `$defs` inlined, for providers that don't resolve `$ref`."""
+    schema = schema_cls.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(definitions[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
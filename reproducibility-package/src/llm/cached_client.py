@@ -0,0 +1,94 @@
+import hashlib
+import json
+import threading
+
+from pydantic import BaseModel
+
+from src.llm.base import LLMClient
+from src.llm.response_format import LLMResponse
+from src.utils.disk_cache import DiskCache
+
+
+class LLMCacheMiss(RuntimeError):
+    pass
+
+
+class CachedLLMClient(LLMClient):
+    """Wraps any LLMClient and serves repeated requests from a persistent on-disk cache.
+
+    Modes: `read_write` calls the provider on a miss and stores the response, `replay` never calls
+    the provider and raises LLMCacheMiss instead.
+    """
+
+    def __init__(self, client: LLMClient, provider: str, cache: DiskCache, mode: str = "read_write"):
+        if mode not in ("read_write", "replay"):
+            raise ValueError(f"Unsupported LLM cache mode: {mode}")
+        self.client = client
+        self.provider = provider
+        self.cache = cache
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # model, temperature, max_tokens, ... of the wrapped client
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def cache_key(self, messages: list[dict], **kwargs) -> str:
+        request = {
+            "provider": self.provider,
+            "model": self.client.model,
+            "temperature": self.client.temperature,
+            "max_tokens": self.client.max_tokens,
+            "messages": messages,
+            "kwargs": {name: self._describe(value) for name, value in sorted(kwargs.items())},
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _describe(value):
+        # response formats are pydantic classes, key them by name and schema
+        if isinstance(value, type) and issubclass(value, BaseModel):
+            return {"name": value.__name__, "schema": value.model_json_schema()}
+        return value
+
+    def _lookup(self, key: str):
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count(hit=True)
+            return LLMResponse.model_validate(cached)
+
+        self._count(hit=False)
+        if self.mode == "replay":
+            raise LLMCacheMiss(f"No cached response for {self.provider}/{self.client.model} (key {key[:12]})")
+        return None
+
+    def call(self, messages: list[dict], **kwargs) -> LLMResponse:
+        key = self.cache_key(messages, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        response = self.client.call(messages=messages, **kwargs)
+        self.cache.set(key, response.model_dump())
+        return response
+
+    async def acall(self, messages: list[dict], **kwargs) -> LLMResponse:
+        key = self.cache_key(messages, **kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        response = await self.client.acall(messages=messages, **kwargs)
+        self.cache.set(key, response.model_dump())
+        return response
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
@@ -1,9 +1,10 @@
 import os
 
 from src.config.loader import ConfigLoader
-from src.llm.antrhopic_client import AnthropicClient
-from src.llm.openai_client import OpenAIClient
-from src.llm.ollama_client import OllamaClient
+from src.llm.base import LLMClient
+from src.llm.cached_client import CachedLLMClient
+from src.llm.rate_limiter import ModelScheduler, ScheduledLLMClient
+from src.utils.disk_cache import DiskCache
 
 
 class ModelFactory:
@@ -18,21 +19,25 @@ class ModelFactory:
         temperature = self.model_config.temperature
         max_tokens = self.model_config.max_tokens if self.model_config.max_tokens > 0 else None
 
+        # provider SDKs are imported only for the provider that is actually used
         if provider == "openai":
-            return OpenAIClient(
+            from src.llm.openai_client import OpenAIClient
+            client = OpenAIClient(
                 model=model_name,
                 api_key=os.getenv("OPENAI_API_KEY"),
                 temperature=temperature,
                 max_tokens=max_tokens
             )
         elif provider == "ollama":
-            return OllamaClient(
+            from src.llm.ollama_client import OllamaClient
+            client = OllamaClient(
                 model=model_name,
                 temperature=temperature,
                 max_tokens=max_tokens
             )
         elif provider == "anthropic":
-            return AnthropicClient(
+            from src.llm.antrhopic_client import AnthropicClient
+            client = AnthropicClient(
                 model=model_name,
                 api_key=os.getenv("ANTHROPIC_API_KEY"),
                 temperature=temperature,
@@ -40,3 +45,32 @@ class ModelFactory:
             )
         else:
             raise ValueError(f"Unsupported model provider: {provider}")
+
+        # estimated prompt tokens the agents trim refinement histories down to, None keeps the pair rule only
+        client.context_budget = self.model_config.get("context_budget")
+        # constrain responses to the schema natively (OpenAI parse, Anthropic forced tool use, Ollama format)
+        client.structured_output = self.model_config.get("structured_output", True)
+        client.stream = self.model_config.get("stream", False)
+        return self._with_cache(self._with_scheduler(client, provider), provider)
+
+    def _with_scheduler(self, client: LLMClient, provider: str) -> LLMClient:
+        scheduler_config = self.config.get("scheduler")
+        # provider defaults, overridden by the profile's own rate_limits
+        limits = dict(scheduler_config.defaults.get(provider) or {})
+        limits.update(self.model_config.get("rate_limits") or {})
+        scheduler = ModelScheduler.for_model(
+            self.active_model,
+            rpm=limits.get("rpm"),
+            tpm=limits.get("tpm"),
+            max_concurrency=limits.get("max_concurrency", 8),
+            max_retries=scheduler_config.max_retries,
+        )
+        return ScheduledLLMClient(client, scheduler)
+
+    def _with_cache(self, client: LLMClient, provider: str) -> LLMClient:
+        cache_config = self.config.get("llm_cache")
+        # YAML reads an unquoted `off` as False
+        if not cache_config or cache_config.mode in (False, None, "off"):
+            return client
+        cache = DiskCache(self.config.root_dir / cache_config.dir, max_size_mb=cache_config.max_size_mb)
+        return CachedLLMClient(client, provider, cache, mode=cache_config.mode)
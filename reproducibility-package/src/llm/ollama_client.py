@@ -1,9 +1,11 @@
+import json
 from pprint import pprint
+import httpx
 import requests
-from pydantic import BaseModel
 
-from src.llm.base import LLMClient
+from src.llm.base import LLMClient, inline_json_schema
 from src.llm.response_format import AssistantMessage, LLMResponse
+from src.llm.streaming import StreamCollector, finish_stream
 
 
 class OllamaClient(LLMClient):
@@ -13,48 +15,106 @@ class OllamaClient(LLMClient):
         self.base_url = base_url
         self.temperature = temperature
         self.max_tokens = max_tokens
+        # one pooled connection set for all in-flight async requests, no timeout like the blocking requests.post
+        self.async_client = httpx.AsyncClient(timeout=None)
 
-    def call(self, messages: list[dict], **kwargs) -> LLMResponse:
-
-        url = f"{self.base_url}/api/chat"
+    def _payload(self, messages: list[dict], **kwargs) -> dict:
         payload = {
             "model": self.model,
             "messages": messages,
-            "temperature": self.temperature,
+            "temperature": kwargs.get("temperature", self.temperature),
             "options": {
                 "num_predict": self.max_tokens if self.max_tokens > 0 else None,
-                "seed": 42,
+                "seed": kwargs.get("seed", 42),
 
             },
-            "stream": False
+            "stream": self.stream
         }
 
-        if "format" in kwargs:
-            fmt = kwargs["format"]
-            if isinstance(fmt, type) and issubclass(fmt, BaseModel):
-                payload["format"] = fmt.model_json_schema()
-            else:
-                payload["format"] = fmt
+        schema_cls = self.response_schema(kwargs)
+        if schema_cls is not None:
+            # structured output: generation is constrained to the response schema
+            payload["format"] = inline_json_schema(schema_cls)
+        elif isinstance(kwargs.get("format"), (str, dict)):
+            payload["format"] = kwargs["format"]  # e.g. "json"
+        return payload
+
+    def call(self, messages: list[dict], **kwargs) -> LLMResponse:
+        url = f"{self.base_url}/api/chat"
         try:
-            llm_response = requests.post(url, json=payload)
+            if self.stream:
+                collector, final = StreamCollector(self.expects_json(kwargs)), None
+                # leaving the block closes the connection, which makes the server stop generating
+                with requests.post(url, json=self._payload(messages, **kwargs), stream=True) as llm_response:
+                    llm_response.raise_for_status()
+                    for line in llm_response.iter_lines():
+                        final, stop = self._read_chunk(line, collector)
+                        if stop:
+                            break
+                return self._finish_stream(collector, messages, final)
+
+            llm_response = requests.post(url, json=self._payload(messages, **kwargs))
             llm_response.raise_for_status()
+            return self._to_llm_response(llm_response.json())
+
+        except Exception as e:
+            raise RuntimeError(f"Ollama API call failed: {e}")
 
-            data = llm_response.json()
-            content = data.get("message", {}).get("content", "")
-            input_tokens = data.get("prompt_eval_count", 0)
-            output_tokens = data.get("eval_count", 0)
-            token_usage = {
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-                "total_tokens": input_tokens + output_tokens
-            }
-
-            response = LLMResponse(
-                message=AssistantMessage(content=content),
-                token_usage=token_usage,
-                raw=data
-            )
-            return response
+    async def acall(self, messages: list[dict], **kwargs) -> LLMResponse:
+        url = f"{self.base_url}/api/chat"
+        try:
+            if self.stream:
+                collector, final = StreamCollector(self.expects_json(kwargs)), None
+                payload = self._payload(messages, **kwargs)
+                async with self.async_client.stream("POST", url, json=payload) as llm_response:
+                    llm_response.raise_for_status()
+                    async for line in llm_response.aiter_lines():
+                        final, stop = self._read_chunk(line, collector)
+                        if stop:
+                            break
+                return self._finish_stream(collector, messages, final)
+
+            llm_response = await self.async_client.post(url, json=self._payload(messages, **kwargs))
+            llm_response.raise_for_status()
+            return self._to_llm_response(llm_response.json())
 
         except Exception as e:
             raise RuntimeError(f"Ollama API call failed: {e}")
+
+    @staticmethod
+    def _read_chunk(line, collector: StreamCollector) -> tuple:
+        """Feeds one NDJSON line of a streamed chat; returns (the final chunk if this is it, stop reading)."""
+        if not line:
+            return None, False
+        data = json.loads(line)
+        if data.get("done"):
+            return data, True
+        return None, collector.feed(data.get("message", {}).get("content", ""))
+
+    def _finish_stream(self, collector: StreamCollector, messages: list[dict], final: dict) -> LLMResponse:
+        # the final chunk carries the token counts, a stream closed before it gets estimated usage
+        if final is None:
+            return finish_stream(collector, messages, self.model)
+        return finish_stream(collector, messages, self.model, self._token_usage(final), raw=final)
+
+    @staticmethod
+    def _token_usage(data: dict) -> dict:
+        input_tokens = data.get("prompt_eval_count", 0)
+        output_tokens = data.get("eval_count", 0)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        }
+
+    @classmethod
+    def _to_llm_response(cls, data: dict) -> LLMResponse:
+        content = data.get("message", {}).get("content", "")
+        token_usage = cls._token_usage(data)
+
+        return LLMResponse(
+            message=AssistantMessage(content=content),
+            token_usage=token_usage,
+            model=data.get("model"),
+            raw=data
+        )
@@ -1,7 +1,8 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, LengthFinishReasonError, OpenAI
 
 from src.llm.base import LLMClient
 from src.llm.response_format import LLMResponse, AssistantMessage
+from src.llm.streaming import StreamCollector, finish_stream
 
 
 class OpenAIClient(LLMClient):
@@ -10,41 +11,103 @@ class OpenAIClient(LLMClient):
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.client = OpenAI(api_key=api_key)
+        self.async_client = AsyncOpenAI(api_key=api_key)
 
-    def call(self, messages: list[dict], **kwargs) -> LLMResponse:
-        response_format = kwargs.get("format")  # Might be None
+    def _request(self, messages: list[dict], **kwargs) -> dict:
+        request = dict(
+            model=self.model,
+            messages=messages,
+            # speculative candidates override temperature and seed per call
+            temperature=kwargs.get("temperature", self.temperature),
+            max_tokens=self.max_tokens,
+            seed=kwargs.get("seed", 42)
+        )
+        schema_cls = self.response_schema(kwargs)
+        if schema_cls is not None:
+            # pydantic schemas go through the structured outputs API
+            request["response_format"] = schema_cls
+        elif isinstance(kwargs.get("format"), dict):
+            request["response_format"] = kwargs["format"]  # e.g. {"type": "json_object"}
+        return request
 
-        if response_format:
+    def call(self, messages: list[dict], **kwargs) -> LLMResponse:
+        request = self._request(messages, **kwargs)
+        if self.stream:
+            return self._stream(request, messages, self.expects_json(kwargs))
+        if isinstance(request.get("response_format"), type):
             # Structured (pydantic) parsing
-            llm_response = self.client.beta.chat.completions.parse(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                response_format=response_format,
-                seed=42
-            )
+            try:
+                llm_response = self.client.beta.chat.completions.parse(**request)
+            except LengthFinishReasonError as e:
+                # cut off at max_tokens: the partial JSON goes to the tolerant parser instead of failing the call
+                llm_response = e.completion
+        else:
+            llm_response = self.client.chat.completions.create(**request)
+        return self._to_llm_response(llm_response)
 
+    async def acall(self, messages: list[dict], **kwargs) -> LLMResponse:
+        request = self._request(messages, **kwargs)
+        if self.stream:
+            return await self._astream(request, messages, self.expects_json(kwargs))
+        if isinstance(request.get("response_format"), type):
+            try:
+                llm_response = await self.async_client.beta.chat.completions.parse(**request)
+            except LengthFinishReasonError as e:
+                llm_response = e.completion
         else:
-            llm_response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                seed=42
-            )
-
-        content = llm_response.choices[0].message.content
-        usage = getattr(llm_response, "usage", {})
-        token_usage = {
+            llm_response = await self.async_client.chat.completions.create(**request)
+        return self._to_llm_response(llm_response)
+
+    def _stream(self, request: dict, messages: list[dict], stop_on_json: bool) -> LLMResponse:
+        collector = StreamCollector(stop_on_json)
+        usage = None
+        try:
+            # the streaming helper takes pydantic response formats like parse() does
+            with self.client.beta.chat.completions.stream(
+                    **request, stream_options={"include_usage": True}) as stream:
+                for event in stream:
+                    if event.type == "content.delta" and collector.feed(event.delta):
+                        break
+                    if event.type == "chunk" and event.chunk.usage:
+                        usage = self._token_usage(event.chunk.usage)
+        except LengthFinishReasonError:
+            pass
+        return finish_stream(collector, messages, self.model, usage)
+
+    async def _astream(self, request: dict, messages: list[dict], stop_on_json: bool) -> LLMResponse:
+        collector = StreamCollector(stop_on_json)
+        usage = None
+        try:
+            async with self.async_client.beta.chat.completions.stream(
+                    **request, stream_options={"include_usage": True}) as stream:
+                async for event in stream:
+                    if event.type == "content.delta" and collector.feed(event.delta):
+                        break
+                    if event.type == "chunk" and event.chunk.usage:
+                        usage = self._token_usage(event.chunk.usage)
+        except LengthFinishReasonError:
+            pass
+        return finish_stream(collector, messages, self.model, usage)
+
+    @staticmethod
+    def _token_usage(usage) -> dict:
+        return {
             "input_tokens": usage.prompt_tokens if hasattr(usage, "prompt_tokens") else usage.get("prompt_tokens"),
             "output_tokens": usage.completion_tokens if hasattr(usage, "completion_tokens") else usage.get(
                 "completion_tokens"),
             "total_tokens": usage.total_tokens if hasattr(usage, "total_tokens") else usage.get("total_tokens")
         }
 
+    @classmethod
+    def _to_llm_response(cls, llm_response) -> LLMResponse:
+        message = llm_response.choices[0].message
+        # a refusal has no content, it then fails parsing like any other unusable answer
+        content = message.content or getattr(message, "refusal", None) or ""
+        token_usage = cls._token_usage(getattr(llm_response, "usage", {}))
+
         return LLMResponse(
             message=AssistantMessage(content=content),
             token_usage=token_usage,
+            model=getattr(llm_response, "model", None),
             raw=llm_response.model_dump() if hasattr(llm_response, "model_dump") else llm_response.dict()
         )
@@ -0,0 +1,287 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+from src.llm.base import LLMClient
+from src.llm.response_format import LLMResponse
+from src.utils.helper import estimate_message_tokens
+
+THROTTLE_STATUS_CODES = (429, 503, 529)
+
+
+class TokenBucket:
+    """Reservation based token bucket: callers take what they need up front and sleep off any debt.
+
+    Going negative keeps waiters in arrival order without polling, and works the same for threads
+    (time.sleep) and coroutines (asyncio.sleep).
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Takes `amount` tokens and returns how many seconds the caller has to wait before using them."""
+        with self._lock:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, delta: float):
+        """Corrects an earlier reservation once the real consumption is known (negative refunds)."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+    def drain(self, seconds: float):
+        """Pushes the bucket into debt so nobody sends for `seconds`, used when the provider throttles us."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on in-flight requests: grows by one after a window of healthy calls, halves when throttled.
+
+    A call counts as slow when its latency per output token is more than twice the smoothed latency of
+    its call type, which is how a saturated (e.g. local Ollama) server shows up before it starts failing.
+    Call types (the response schema) keep separate baselines: time to first token dominates short
+    judge verdicts, so their per-token latency is far above that of long code generations.
+    """
+
+    # weight of the newest call in a call type's baseline (a tenth of it for slow calls, so saturation
+    # does not become the new normal within a few calls), and calls seen before the baseline is trusted
+    SMOOTHING = 0.1
+    WARMUP_CALLS = 5
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(min_limit, max_limit)
+        self.min_limit = min_limit
+        self.limit = float(max(min_limit, self.max_limit // 2))
+        self.in_flight = 0
+        # call type -> [smoothed latency per output token, calls seen]
+        self.baselines = {}
+        self._successes = 0
+        self._condition = threading.Condition()
+        # (event loop, future) of coroutines waiting for a slot, woken by release() like the threads
+        self._async_waiters = deque()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def _wake_async_waiters(self):
+        while self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(_set_done, waiter)
+            except RuntimeError:
+                pass  # its event loop is closed
+
+    def release(self, latency: float = None, output_tokens: int = None, throttled: bool = False,
+                call_type: str = None):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._successes = 0
+            elif latency is not None:
+                per_token = latency / max(1, output_tokens or 1)
+                baseline = self.baselines.setdefault(call_type, [per_token, 0])
+                slow = baseline[1] >= self.WARMUP_CALLS and per_token > 2 * baseline[0]
+                baseline[0] += (self.SMOOTHING / 10 if slow else self.SMOOTHING) * (per_token - baseline[0])
+                baseline[1] += 1
+                if slow:
+                    self.limit = max(self.min_limit, self.limit - 1)
+                    self._successes = 0
+                else:
+                    self._successes += 1
+                    if self._successes >= int(self.limit):
+                        self.limit = min(self.max_limit, self.limit + 1)
+                        self._successes = 0
+            self._condition.notify_all()
+            self._wake_async_waiters()
+
+
+def _set_done(future):
+    if not future.done():  # a cancelled waiter is simply dropped
+        future.set_result(None)
+
+
+def throttle_delay(error: BaseException):
+    """Returns the provider's suggested retry delay (0 if none) for 429/overload errors, None otherwise."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        response = getattr(error, "response", None)
+        status = getattr(error, "status_code", None) or getattr(response, "status_code", None)
+        message = str(error).lower()
+        if status in THROTTLE_STATUS_CODES or "rate limit" in message or "overloaded" in message:
+            headers = getattr(response, "headers", None) or {}
+            try:
+                return float(headers.get("retry-after", 0))
+            except (TypeError, ValueError):
+                return 0.0
+        error = error.__cause__ or error.__context__
+    return None
+
+
+class ModelScheduler:
+    """Per model profile admission control shared by every client of that profile."""
+
+    _schedulers = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, name: str, rpm: float = None, tpm: float = None, max_concurrency: int = 8,
+                 max_retries: int = 5, max_backoff: float = 60.0):
+        self.name = name
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrencyLimiter(max_concurrency)
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        # expected completion size, learned from the token_usage the clients report
+        self.expected_output_tokens = 512.0
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def for_model(cls, name: str, **limits) -> "ModelScheduler":
+        with cls._registry_lock:
+            if name not in cls._schedulers:
+                cls._schedulers[name] = cls(name, **limits)
+            return cls._schedulers[name]
+
+    def _reserve(self, messages: list[dict]) -> tuple[float, float]:
+        estimate = estimate_message_tokens(messages) + self.expected_output_tokens
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket:
+            wait = max(wait, self.token_bucket.reserve(estimate))
+        return estimate, wait
+
+    def _settle(self, estimate: float, response: LLMResponse, latency: float, call_type: str = None):
+        total_tokens = response.token_usage.get("total_tokens") or 0
+        output_tokens = response.token_usage.get("output_tokens") or 0
+        if self.token_bucket and total_tokens:
+            self.token_bucket.adjust(total_tokens - estimate)
+        with self._stats_lock:
+            if output_tokens:
+                self.expected_output_tokens = 0.8 * self.expected_output_tokens + 0.2 * output_tokens
+        self.concurrency.release(latency=latency, output_tokens=output_tokens, call_type=call_type)
+
+    def _backoff(self, error: BaseException, attempt: int) -> float:
+        delay = throttle_delay(error)
+        if delay is None or attempt >= self.max_retries:
+            return None
+        delay = max(delay, min(self.max_backoff, 2 ** attempt)) * random.uniform(1.0, 1.5)
+        # everyone sharing this model backs off, not just the caller that got throttled
+        for bucket in (self.request_bucket, self.token_bucket):
+            if bucket:
+                bucket.drain(delay)
+        print(f"[WARN] [{self.name}] throttled ({error}), retrying in {delay:.1f}s "
+              f"(concurrency limit {int(self.concurrency.limit)})")
+        return delay
+
+    def run(self, call, messages: list[dict], call_type: str = None) -> LLMResponse:
+        attempt = 0
+        while True:
+            estimate, wait = self._reserve(messages)
+            if wait:
+                time.sleep(wait)
+            self.concurrency.acquire()
+            start = time.monotonic()
+            try:
+                response = call()
+            except Exception as e:
+                self.concurrency.release(throttled=throttle_delay(e) is not None)
+                if self.token_bucket:
+                    self.token_bucket.adjust(-estimate)
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._settle(estimate, response, time.monotonic() - start, call_type)
+            return response
+
+    async def run_async(self, call, messages: list[dict], call_type: str = None) -> LLMResponse:
+        attempt = 0
+        while True:
+            estimate, wait = self._reserve(messages)
+            if wait:
+                await asyncio.sleep(wait)
+            await self.concurrency.acquire_async()
+            start = time.monotonic()
+            try:
+                response = await call()
+            except Exception as e:
+                self.concurrency.release(throttled=throttle_delay(e) is not None)
+                if self.token_bucket:
+                    self.token_bucket.adjust(-estimate)
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._settle(estimate, response, time.monotonic() - start, call_type)
+            return response
+
+
+class ScheduledLLMClient(LLMClient):
+    """Routes every call of the wrapped client through its model's ModelScheduler."""
+
+    def __init__(self, client: LLMClient, scheduler: ModelScheduler):
+        self.client = client
+        self.scheduler = scheduler
+
+    def __getattr__(self, name):
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    @staticmethod
+    def call_type(kwargs: dict) -> str:
+        # the response schema tells a judge verdict from a code generation
+        schema = kwargs.get("response_format") or kwargs.get("format")
+        return getattr(schema, "__name__", None) or (str(schema) if schema else "text")
+
+    def call(self, messages: list[dict], **kwargs) -> LLMResponse:
+        return self.scheduler.run(lambda: self.client.call(messages=messages, **kwargs), messages,
+                                  self.call_type(kwargs))
+
+    async def acall(self, messages: list[dict], **kwargs) -> LLMResponse:
+        return await self.scheduler.run_async(lambda: self.client.acall(messages=messages, **kwargs), messages,
+                                              self.call_type(kwargs))
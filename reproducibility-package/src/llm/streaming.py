@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+from collections import defaultdict
+
+from src.llm.response_format import AssistantMessage, LLMResponse
+from src.utils.helper import estimate_message_tokens, estimate_tokens
+
+
+class StreamCollector:
+    """Accumulates a streamed completion and its latency metrics.
+
+    Once the first JSON object in the stream is complete and parses, `feed` returns True as soon as the
+    model writes anything after it but whitespace or a closing code fence, so the caller can close the
+    stream instead of paying for the rambling. The scan is incremental: every chunk is looked at once,
+    tracking string, escape and nesting state.
+    """
+
+    def __init__(self, stop_on_json: bool = True):
+        self.stop_on_json = stop_on_json
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.stopped_early = False
+        self._chunks = []
+        self._length = 0
+        self._object_start = None
+        self._object_end = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def content(self) -> str:
+        return "".join(self._chunks)
+
+    def feed(self, text: str) -> bool:
+        if not text:
+            return False
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        offset = self._length
+        self._chunks.append(text)
+        self._length += len(text)
+        if not self.stop_on_json:
+            return False
+        if self._object_end is None:
+            self._scan(text, offset)
+        if self._object_end is not None and self.content[self._object_end:].strip().strip("`"):
+            self._chunks = [self.content[:self._object_end]]
+            self.stopped_early = True
+            return True
+        return False
+
+    def _scan(self, text: str, offset: int):
+        for i, char in enumerate(text):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"' and self._object_start is not None:
+                self._in_string = True
+            elif char == "{":
+                if self._object_start is None:
+                    self._object_start = offset + i
+                self._depth += 1
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if self._depth == 0 and self._complete(offset + i + 1):
+                    self._object_end = offset + i + 1
+                    return
+
+    def _complete(self, end: int) -> bool:
+        # malformed JSON (e.g. unescaped quotes) can fool the scanner, only a parseable object ends the stream
+        try:
+            json.loads(self.content[self._object_start:end], strict=False)
+            return True
+        except ValueError:
+            return False
+
+    def estimated_usage(self, messages: list[dict], input_tokens: int = None) -> dict:
+        """Token usage when the stream was closed before the provider reported it."""
+        if input_tokens is None:
+            input_tokens = estimate_message_tokens(messages)
+        output_tokens = estimate_tokens(self.content)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def metrics(self, output_tokens: int, usage_estimated: bool = False) -> dict:
+        end = time.perf_counter()
+        ttft = (self.first_token_at or end) - self.start
+        generation_time = end - (self.first_token_at or end)
+        return {
+            "streamed": True,
+            "ttft": round(ttft, 4),
+            "duration": round(end - self.start, 4),
+            "output_tokens": output_tokens,
+            "tokens_per_sec": round(output_tokens / generation_time, 2) if generation_time > 0 else None,
+            "stopped_early": self.stopped_early,
+            "usage_estimated": usage_estimated,
+        }
+
+
+class StreamStats:
+    """Per-model totals of the streamed calls, for the end-of-run summary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = defaultdict(list)
+
+    def record(self, model: str, metrics: dict):
+        with self._lock:
+            self._calls[model].append(metrics)
+
+    def models(self) -> list:
+        with self._lock:
+            return sorted(self._calls)
+
+    def summary(self, model: str) -> str:
+        with self._lock:
+            calls = list(self._calls.get(model, ()))
+        if not calls:
+            return "no streamed calls"
+        ttft = sorted(call["ttft"] for call in calls)[len(calls) // 2]
+        rates = [call["tokens_per_sec"] for call in calls if call["tokens_per_sec"]]
+        rate = f"{sum(rates) / len(rates):.1f}" if rates else "n/a"
+        early = sum(call["stopped_early"] for call in calls)
+        return f"{len(calls)} calls, median TTFT {ttft:.2f}s, {rate} tokens/s, {early} stopped early"
+
+
+stats = StreamStats()
+
+
+def finish_stream(collector: StreamCollector, messages: list[dict], model: str, token_usage: dict = None,
+                  content: str = None, raw: dict = None, input_tokens: int = None) -> LLMResponse:
+    """LLMResponse of a streamed call, with its metrics; usage is estimated when the provider never sent it."""
+    usage_estimated = token_usage is None
+    if usage_estimated:
+        token_usage = collector.estimated_usage(messages, input_tokens)
+    metrics = collector.metrics(token_usage.get("output_tokens") or 0, usage_estimated)
+    stats.record(model, metrics)
+    return LLMResponse(
+        message=AssistantMessage(content=collector.content if content is None else content),
+        token_usage=token_usage,
+        model=model,
+        raw=raw or {"model": model, "stream": True, "stopped_early": collector.stopped_early},
+        metrics=metrics,
+    )
@@ -0,0 +1,294 @@
+import json
+import re
+import threading
+from collections import Counter
+from typing import Type
+
+from pydantic import BaseModel
+
+# fields holding source code or requirement files: control characters in them are content, not noise
+CODE_FIELDS = frozenset({"buggy_code", "patched_code", "requirements"})
+
+_LEADING_FENCE_RE = re.compile(r"^```[\w+-]*[ \t]*\r?\n?")
+_TRAILING_FENCE_RE = re.compile(r"\s*```\s*$")
+
+# the scanner jumps between these characters instead of walking the response one character at a time
+_STRUCTURAL_RE = re.compile(r'["“”{}\[\],]')
+_STRING_SPECIAL_RE = re.compile(r'["“”\\\x00-\x1f\x7f]')
+# a quote inside a string only closes it when what follows fits the place the string is in
+_KEY_END_RE = re.compile(r'\s*:')
+_OBJECT_VALUE_END_RE = re.compile(r'\s*(?:,\s*(?:["“”][^"“”\n]*["“”]\s*:|[}\]])|[}\]][ \t]*(?:[,}\]\r\n]|$)|$)')
+_ARRAY_VALUE_END_RE = re.compile(r'\s*(?:,|[}\]][ \t]*(?:[,}\]\r\n]|$)|$)')
+# ... or, directly inside the outermost object, when it is followed by a bracket that can only be the
+# object's end: the response's last one, or one after which no quote follows
+_CLOSER_RE = re.compile(r'\s*[}\]]')
+_VALID_ESCAPES = frozenset('"\\/bfnrtu')
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class ParseStats:
+    """Counts which path produced each parsed response, per model, and which repairs the scanner applied.
+
+    With structured outputs every response should parse directly; any other path is a parse failure of
+    the provider's constrained output, and `failed` ones cost a refinement round-trip.
+    """
+
+    PATHS = ("direct", "fenced", "repaired", "fields", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.paths = Counter()
+        self.repairs = Counter()
+        self.by_source = {}
+
+    def record(self, path: str, repairs=(), source: str = None):
+        with self._lock:
+            self.paths[path] += 1
+            self.repairs.update(repairs)
+            self.by_source.setdefault(source, Counter())[path] += 1
+
+    def failures(self, source: str = None) -> int:
+        """Responses that did not parse as strict JSON, for one model or all of them."""
+        with self._lock:
+            paths = self.paths if source is None else self.by_source.get(source, Counter())
+            return sum(count for path, count in paths.items() if path != "direct")
+
+    def reset(self):
+        with self._lock:
+            self.paths.clear()
+            self.repairs.clear()
+            self.by_source.clear()
+
+    def summary(self, source: str = None) -> str:
+        with self._lock:
+            paths = self.paths if source is None else self.by_source.get(source, Counter())
+            summary = ", ".join(f"{path}={paths[path]}" for path in self.PATHS)
+            if source is None and self.repairs:
+                summary += " (repairs: " + ", ".join(
+                    f"{name}={count}" for name, count in self.repairs.most_common()) + ")"
+        return summary
+
+
+stats = ParseStats()
+
+
+def strip_fences(text: str) -> str:
+    """Response without a Markdown code fence wrapped around the whole of it."""
+    if not text.startswith("```"):
+        return text
+    return _TRAILING_FENCE_RE.sub("", _LEADING_FENCE_RE.sub("", text, count=1))
+
+
+def repair_json(text: str) -> tuple:
+    """Single pass over an almost-JSON response, returning `(json_text, repairs)`.
+
+    Drops prose around the outermost object, turns smart quotes used as delimiters into plain ones,
+    escapes raw control characters, stray backslashes and inner quotes inside strings, drops trailing
+    commas and closes what a truncated response left open. `repairs` names the fixes that were applied.
+    """
+    repairs = set()
+    out = []
+    stack = []
+    n = len(text)
+
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return text, repairs
+    if text[:start].strip():
+        repairs.add("prose")
+    pos = start
+    last_closer = max(text.rfind("}"), text.rfind("]"))
+    last_quote = max(text.rfind('"'), text.rfind("“"), text.rfind("”"))
+    pending_comma = False
+    expect_key = False
+
+    while pos < n:
+        match = _STRUCTURAL_RE.search(text, pos)
+        end = match.start() if match else n
+        gap = text[pos:end]
+        if gap.strip():
+            if pending_comma:
+                out.append(",")
+                pending_comma = False
+            expect_key = False
+        out.append(gap)
+        if match is None:
+            pos = n
+            break
+        char = match.group()
+        pos = end + 1
+
+        if char in "{[":
+            if pending_comma:
+                out.append(",")
+                pending_comma = False
+            stack.append(char)
+            expect_key = char == "{"
+            out.append(char)
+        elif char in "}]":
+            if pending_comma:
+                repairs.add("trailing_comma")
+                pending_comma = False
+            if stack:
+                out.append(_CLOSERS[stack.pop()])
+            if not stack:
+                break
+            expect_key = False
+        elif char == ",":
+            pending_comma = True
+            expect_key = bool(stack) and stack[-1] == "{"
+        else:
+            if pending_comma:
+                out.append(",")
+                pending_comma = False
+            if char != '"':
+                repairs.add("smart_quotes")
+            pos = _scan_string(text, pos, out, repairs, smart=char != '"', key=expect_key,
+                               in_array=bool(stack) and stack[-1] == "[",
+                               outermost=(last_closer, last_quote) if len(stack) == 1 else None)
+            expect_key = False
+
+    if stack:
+        repairs.add("unclosed")
+        out.extend(_CLOSERS[opener] for opener in reversed(stack))
+    elif text[pos:].strip():
+        repairs.add("prose")
+    return "".join(out), repairs
+
+
+def _scan_string(text: str, pos: int, out: list, repairs: set, smart: bool, key: bool, in_array: bool,
+                 outermost: tuple = None) -> int:
+    """Copies the string starting after its opening quote at `pos`; returns the position after its end.
+
+    `outermost` holds the positions of the response's last `}`/`]` and last quote, for strings directly
+    inside the outermost object: their closing quote may be followed by the object's end and then prose.
+    """
+    end_re = _KEY_END_RE if key else (_ARRAY_VALUE_END_RE if in_array else _OBJECT_VALUE_END_RE)
+    n = len(text)
+    out.append('"')
+    while True:
+        match = _STRING_SPECIAL_RE.search(text, pos)
+        if match is None:
+            out.append(text[pos:])
+            out.append('"')
+            repairs.add("unclosed")
+            return n
+        out.append(text[pos:match.start()])
+        char = match.group()
+        pos = match.end()
+        if char == "\\":
+            if pos < n and text[pos] in _VALID_ESCAPES:
+                out.append(text[pos - 1:pos + 1])
+                pos += 1
+            else:
+                out.append("\\\\")
+                repairs.add("invalid_escape")
+        elif char in '"“”':
+            if (char == '"' or smart) and (end_re.match(text, pos) or _closes_outermost(text, pos, outermost)):
+                out.append('"')
+                return pos
+            if char == '"':
+                out.append('\\"')
+                repairs.add("inner_quotes")
+            else:
+                out.append(char)
+        else:
+            out.append(_CONTROL_ESCAPES.get(char) or f"\\u{ord(char):04x}")
+            repairs.add("raw_control")
+
+
+def _closes_outermost(text: str, pos: int, outermost: tuple) -> bool:
+    if outermost is None:
+        return False
+    match = _CLOSER_RE.match(text, pos)
+    if match is None:
+        return False
+    last_closer, last_quote = outermost
+    return match.end() - 1 == last_closer or match.end() > last_quote
+
+
+class StructuredParser:
+    """Parses LLM responses into one response schema.
+
+    Built once per schema: the field extractors of the last-resort fallback are compiled up front. A
+    response is tried as strict JSON first, then without a surrounding code fence, then through
+    `repair_json`, and only then field by field.
+    """
+
+    def __init__(self, schema_cls: Type[BaseModel]):
+        self.schema_cls = schema_cls
+        self._extractors = tuple(
+            (name, re.compile(rf'"{re.escape(name)}"\s*:\s*(?:"((?:[^"\\]|\\.)*)"|([\w.\-]+))', re.DOTALL))
+            for name in schema_cls.model_fields
+        )
+
+    def parse(self, content: str, source: str = None) -> BaseModel:
+        """`source` (the model that wrote the response) only labels the statistics."""
+        content = content.strip()
+        try:
+            result = self.schema_cls.model_validate_json(content)
+            stats.record("direct", source=source)
+            return result
+        except ValueError:
+            pass
+
+        unfenced = strip_fences(content)
+        if unfenced is not content:
+            try:
+                result = self.schema_cls.model_validate_json(unfenced)
+                stats.record("fenced", source=source)
+                return result
+            except ValueError:
+                pass
+
+        repaired, repairs = repair_json(unfenced)
+        try:
+            result = self.schema_cls.model_validate(json.loads(repaired))
+            stats.record("repaired", repairs, source)
+            return result
+        except ValueError:
+            print(f"[DEBUG] JSON repair failed for {self.schema_cls.__name__}. Attempting field extraction...")
+
+        try:
+            result = self.schema_cls.model_validate(self._extract_fields(unfenced))
+            stats.record("fields", repairs, source)
+            return result
+        except ValueError as e:
+            stats.record("failed", repairs, source)
+            raise ValueError(
+                f"Manual schema-based parse failed.\nOriginal:\n{content}\n\nError:\n{e}"
+            )
+
+    def _extract_fields(self, content: str) -> dict:
+        result = {}
+        for name, extractor in self._extractors:
+            match = extractor.search(content)
+            if not match:
+                print(f"[DEBUG] Field '{name}' not found in fallback parse.")
+                continue
+            value = match.group(1) if match.group(1) is not None else match.group(2)
+            try:
+                value = json.loads(f'"{value}"')
+            except ValueError:
+                pass
+            if name not in CODE_FIELDS:
+                value = re.sub(r"[\x00-\x1F\x7F]", "", value).strip()
+            result[name] = value
+        return result
+
+
+_parsers = {}
+_parsers_lock = threading.Lock()
+
+
+def get_parser(schema_cls: Type[BaseModel]) -> StructuredParser:
+    parser = _parsers.get(schema_cls)
+    if parser is None:
+        with _parsers_lock:
+            parser = _parsers.setdefault(schema_cls, StructuredParser(schema_cls))
+    return parser
+
+
+def parse_as(content: str, schema_cls: Type[BaseModel], source: str = None) -> BaseModel:
+    return get_parser(schema_cls).parse(content, source)
@@ -4,172 +4,215 @@ from datetime import datetime
 from src.agents.buggy_code_generator import BuggyCodeGeneratorAgent
 from src.agents.buggy_thought_generator import BuggyThoughtGeneratorAgent
 from src.agents.judge.judge import JudgeAgent
-from src.config.loader import ConfigLoader
+from src.config.registry import get_config
 from src.llm.base import LLMClient
+from src.models.llm_response_format import BuggyCodeGenerationResult, JudgeResult
 from pprint import pprint
 from src.pipeline.buggy_thought_pipeline import BuggyThoughtGeneratorPipeline
+from src.pipeline.code_loop import CodeLoop, CodeLoopPipeline
+from src.pipeline.speculation import Speculator
 from src.utils.helper import clean_code_fields, is_error, summarize_docker_error
-from src.validator.docker_validator import DockerValidator
+from src.validator.factory import ValidatorFactory
 
 
-class BuggyCodeGenerationPipeline:
+class BuggyCodeGenerationPipeline(CodeLoopPipeline):
+    LOOP_NAME = "BUGGY CODE"
+
     # todo: use logger
     def __init__(self, generator_llm: LLMClient, judge_llm: LLMClient,
-                 loggers: dict = None, posts=None):
-        cfg = ConfigLoader()
+                 loggers: dict = None, posts=None, journal=None):
+        cfg = get_config()
         self.posts = posts
+        self.journal = journal
         self.thought_agent = BuggyThoughtGeneratorAgent(generator_llm)
         self.thought_pipeline = BuggyThoughtGeneratorPipeline(generator_llm, judge_llm, loggers, posts)
         self.judge_agent = JudgeAgent(judge_llm)
         self.code_agent = BuggyCodeGeneratorAgent(generator_llm)
         self.loggers = loggers
-        self.docker_template_path = cfg.root_dir / "src/utils/docker_template/Dockerfile.template"
-        self.validator = DockerValidator(self.docker_template_path)
+        self.validator = ValidatorFactory(cfg).get_validator()
+        self.speculator = Speculator.from_config(cfg.get("speculation"))
+
+    def run(self, post, checkpoint: dict = None):
+        """Runs the thought and code stages of a post, reusing the artifacts of stages in `checkpoint`."""
+        checkpoint = checkpoint or {}
+        print(f"Evaluating question id: {post['question_id']}")
+
+        guidance = self.thoughts(post, checkpoint)
+        restored = self.restored_code(post, checkpoint)
+        if restored is not None:
+            return restored
+        return self.complete(self.run_loop(CodeLoop(post, guidance)))
 
-    def run(self, post):
+    def thoughts(self, post, checkpoint: dict) -> dict:
         question_id = post['question_id']
-        print(f"Evaluating question id: {question_id}")
+        if "buggy_thoughts" in checkpoint:
+            print(f"[RESUME] Reusing accepted buggy thoughts for {question_id}")
+            return {
+                key: JudgeResult(**value) if key.endswith("_judgment") else value
+                for key, value in checkpoint["buggy_thoughts"].items()
+            }
         guidance = self.thought_pipeline.run(post)
-        buggy_code, buggy_code_judgement = self.generate_and_evaluate_buggy_code(post, guidance)
+        if self.journal is not None:
+            self.journal.record(question_id, "buggy_thoughts", guidance)
+        return guidance
+
+    def restored_code(self, post, checkpoint: dict):
+        if "buggy_code" not in checkpoint:
+            return None
+        print(f"[RESUME] Reusing buggy code for {post['question_id']}")
+        return (BuggyCodeGenerationResult(**checkpoint["buggy_code"]["result"]),
+                JudgeResult(**checkpoint["buggy_code"]["judgement"]))
+
+    def complete(self, loop: CodeLoop):
+        """Result of a finished loop, journaled as the post's buggy_code stage."""
+        buggy_code, buggy_code_judgement = self.loop_result(loop)
+        if self.journal is not None:
+            self.journal.record(loop.post["question_id"], "buggy_code",
+                                {"result": buggy_code, "judgement": buggy_code_judgement})
         return buggy_code, buggy_code_judgement
 
     def generate_and_evaluate_buggy_code(self, post: dict, guidance, max_exec_iter=3, max_review_iter=3):
-        question_id = post["question_id"]
-        question = post["question"]
-
-        generation_start_time = datetime.now()
-        messages, parsed, gen_token_usage = self.code_agent.generate_buggy_code(question, guidance)
-        generation_end_time = datetime.now()
-        generation_duration = generation_end_time - generation_start_time
-
-        clean_code_fields(parsed, ["buggy_code"])
-
-        validation_result = None
-        review_result = None
-
-        exec_iter, review_iter = 0, 0
-        phase = "execution"
-        docker_error_msg = ""
-
-        while exec_iter < max_exec_iter or review_iter < max_review_iter:
-            print(f"[DEBUG] [BUGGY CODE] exec_iter={exec_iter}, review_iter={review_iter}, phase={phase}")
-            # print(f"\n[ITERATION {exec_iter + review_iter + 1}] Phase: {phase}")
-
-            if phase == "execution" and exec_iter < max_exec_iter:
-                docker_error_msg = ""
-                try:
-                    validation_result = self.validator.validate(
-                        script=parsed.buggy_code,
-                        requirements=parsed.requirements,
-                    )
-                    print("Validation result:")
-                    pprint(validation_result)
-
-                    passed = not is_error(validation_result["stderr"])
-                    if passed:
-                        print(f"[INFO] passed on iteration: {exec_iter + 1}")
-                        phase = "review"
-                        continue
-                    else:
-                        print(f"[FAIL] Execution failed. Refining...")
-
-                except (subprocess.CalledProcessError, RuntimeError) as e:
-                    docker_error_msg = summarize_docker_error(str(e))
-                    print(f"[ERROR] Docker validation failed: {docker_error_msg}")
-                    validation_result = {
-                        "stdout": "",
-                        "stderr": "",
-                        "exit_code": -1,
-                    }
-                self.loggers["buggy_code_logger"].append_row(
-                    question_id=question_id,
-                    question=question,
-                    buggy_code_intent=guidance["buggy_code_intent"],
-                    buggy_functional_requirements=guidance["buggy_functional_requirements"],
-                    buggy_scot=guidance["buggy_scot"],
-                    buggy_code=parsed.buggy_code,
-                    stdout=validation_result.get("stdout", ""),
-                    judge_buggy_code_label="not_reviewed",
-                    judge_buggy_code_rational="execution phase only",
-                    requirements=parsed.requirements,
-                    stderr=validation_result.get("stderr", ""),
-                    error=docker_error_msg,
-                    exec_iteration=exec_iter + 1,
-                    review_iteration=review_iter,
-                    exit_code=validation_result.get("returncode", -1),
-                    generation_token_usage=gen_token_usage,
-                    generation_duration=round(generation_duration.total_seconds(), 2),
-                    # evluation_duration=round(evaluation_duration.total_seconds(), 2),
-                )
-                generation_start_time = datetime.now()
-                messages, parsed, gen_token_usage = self.code_agent.refine_buggy_code(messages, {
-                    "requirements": parsed.requirements,
-                    "buggy_code": parsed.buggy_code,
-                    "buggy_stderr": validation_result.get("stderr", "") if validation_result else "",
-                    "docker_error": docker_error_msg or "No docker error"
-                })
-                generation_end_time = datetime.now()
-                generation_duration = generation_end_time - generation_start_time
-
-                clean_code_fields(parsed, ["buggy_code"])
-                exec_iter += 1 # one-exec-refinement block
-
-            elif phase == "review" and review_iter < max_review_iter:
-                evaluation_start_time = datetime.now()
-                review_result, review_token_usage = self.judge_agent.evaluate_buggy_code(question, parsed.buggy_code)
-                evaluation_end_time = datetime.now()
-                evaluation_duration = evaluation_end_time - evaluation_start_time
-
-                print(f"[JUDGE] label: {review_result.label}, rationale: {review_result.rationale}")
-                self.loggers["buggy_code_logger"].append_row(
-                    question_id=question_id,
-                    question=question,
-                    buggy_code_intent=guidance["buggy_code_intent"],
-                    buggy_functional_requirements=guidance["buggy_functional_requirements"],
-                    buggy_scot=guidance["buggy_scot"],
-                    buggy_code=parsed.buggy_code,
-                    stdout=validation_result.get("stdout", "") if validation_result else "",
-                    judge_buggy_code_label=review_result.label,
-                    judge_buggy_code_rational=review_result.rationale,
-                    requirements=parsed.requirements,
-                    stderr=validation_result.get("stderr", "") if validation_result else "",
-                    error=docker_error_msg,
-                    exec_iteration=exec_iter,
-                    review_iteration=review_iter + 1,
-                    exit_code=validation_result.get("returncode", -1) if validation_result else -1,
-                    generation_token_usage=gen_token_usage,
-                    review_token_usage=review_token_usage,
-                    generation_duration=round(generation_duration.total_seconds(), 2),
-                    evaluation_duration=round(evaluation_duration.total_seconds(), 2),
-                )
-                if review_result.label.lower() == "correct":
-                    print(f"[INFO] Review passed on iteration {review_iter + 1}")
-                    break
-                print(f"[FAIL] Review failed. Refining buggy code.")
-
-                generation_start_time = datetime.now()
-                messages, parsed, gen_token_usage = self.code_agent.refine_buggy_code_reviewed(messages, review_result)
-                generation_end_time = datetime.now()
-                generation_duration = generation_end_time - generation_start_time
-
-                clean_code_fields(parsed, ["buggy_code"])
-                review_iter += 1
-                if review_iter >= max_review_iter:
-                    print("[INFO] Review limit reached. Stopping.")
-                    break
-
-                if exec_iter >= max_exec_iter:
-                    print("[INFO] Execution limit reached after review. Stopping.")
-                    break
-
-                phase = "execution"
-                review_result = None
-                validation_result = None
-            else:
-                print("[WARN] No valid phase to execute, terminating loop.")
-                break
+        return self.loop_result(self.run_loop(CodeLoop(post, guidance, max_exec_iter, max_review_iter)))
 
-        if review_result:
-            return parsed, review_result
+    @staticmethod
+    def loop_result(loop: CodeLoop):
+        if loop.review_result:
+            return loop.parsed, loop.review_result
+        else:
+            return loop.parsed, {"label": "incorrect", "rationale": "Code did not execute successfully."}
+
+    def _generate(self, loop: CodeLoop):
+        loop.timed(self.code_agent.generate_buggy_code, loop.post["question"], loop.guidance)
+        clean_code_fields(loop.parsed, ["buggy_code"])
+        loop.next_step = "validate"
+
+    def _validate(self, loop: CodeLoop):
+        post, guidance, parsed = loop.post, loop.guidance, loop.parsed
+        loop.docker_error_msg = ""
+        try:
+            loop.validation_result = self.validator.validate(
+                script=parsed.buggy_code,
+                requirements=parsed.requirements,
+            )
+            print("Validation result:")
+            pprint(loop.validation_result)
+
+            passed = not is_error(loop.validation_result["stderr"])
+            if passed:
+                print(f"[INFO] passed on iteration: {loop.exec_iter + 1}")
+                loop.next_step = "review"
+                return
+            else:
+                print(f"[FAIL] Execution failed. Refining...")
+
+        except (subprocess.CalledProcessError, RuntimeError) as e:
+            loop.docker_error_msg = summarize_docker_error(str(e))
+            print(f"[ERROR] Docker validation failed: {loop.docker_error_msg}")
+            loop.validation_result = {
+                "stdout": "",
+                "stderr": "",
+                "exit_code": -1,
+            }
+        self._log_execution(loop, "not_reviewed", "execution phase only")
+        loop.next_step = "refine_execution"
+
+    def _log_execution(self, loop: CodeLoop, label: str, rationale: str):
+        """Trace row of a generated script that was not reviewed (failed to execute, or discarded)."""
+        post, guidance, parsed = loop.post, loop.guidance, loop.parsed
+        validation_result = loop.validation_result or {}
+        self.loggers["buggy_code_logger"].append_row(
+            question_id=post["question_id"],
+            question=post["question"],
+            buggy_code_intent=guidance["buggy_code_intent"],
+            buggy_functional_requirements=guidance["buggy_functional_requirements"],
+            buggy_scot=guidance["buggy_scot"],
+            buggy_code=parsed.buggy_code,
+            stdout=validation_result.get("stdout", ""),
+            row_kind="execution",
+            judge_buggy_code_label=label,
+            judge_buggy_code_rational=rationale,
+            requirements=parsed.requirements,
+            stderr=validation_result.get("stderr", ""),
+            error=loop.docker_error_msg,
+            exec_iteration=loop.exec_iter + 1,
+            review_iteration=loop.review_iter,
+            exit_code=validation_result.get("returncode", -1),
+            exec_cache_hit=validation_result.get("cached"),
+            generation_token_usage=loop.gen_token_usage,
+            candidate=loop.candidate,
+            generation_duration=round(loop.generation_duration.total_seconds(), 2),
+            # evluation_duration=round(evaluation_duration.total_seconds(), 2),
+        )
+
+    def _refine_execution(self, loop: CodeLoop):
+        loop.timed(self.code_agent.refine_buggy_code, loop.messages, {
+            "requirements": loop.parsed.requirements,
+            "buggy_code": loop.parsed.buggy_code,
+            "buggy_stderr": loop.validation_result.get("stderr", "") if loop.validation_result else "",
+            "docker_error": loop.docker_error_msg or "No docker error"
+        })
+        clean_code_fields(loop.parsed, ["buggy_code"])
+        loop.exec_iter += 1  # one-exec-refinement block
+        if loop.exec_iter < loop.max_exec_iter:
+            loop.next_step = "validate"
         else:
-            return parsed, {"label": "incorrect", "rationale": "Code did not execute successfully."}
+            print("[WARN] No valid phase to execute, terminating loop.")
+            loop.next_step = None
+
+    def _review(self, loop: CodeLoop):
+        post, guidance, parsed, validation_result = loop.post, loop.guidance, loop.parsed, loop.validation_result
+        evaluation_start_time = datetime.now()
+        review_result, review_token_usage = self.judge_agent.evaluate_buggy_code(post["question"], parsed.buggy_code)
+        evaluation_end_time = datetime.now()
+        evaluation_duration = evaluation_end_time - evaluation_start_time
+        loop.review_result = review_result
+
+        print(f"[JUDGE] label: {review_result.label}, rationale: {review_result.rationale}")
+        self.loggers["buggy_code_logger"].append_row(
+            question_id=post["question_id"],
+            question=post["question"],
+            buggy_code_intent=guidance["buggy_code_intent"],
+            buggy_functional_requirements=guidance["buggy_functional_requirements"],
+            buggy_scot=guidance["buggy_scot"],
+            buggy_code=parsed.buggy_code,
+            stdout=validation_result.get("stdout", "") if validation_result else "",
+            row_kind="review",
+            judge_buggy_code_label=review_result.label,
+            judge_buggy_code_rational=review_result.rationale,
+            requirements=parsed.requirements,
+            stderr=validation_result.get("stderr", "") if validation_result else "",
+            error=loop.docker_error_msg,
+            exec_iteration=loop.exec_iter,
+            review_iteration=loop.review_iter + 1,
+            exit_code=validation_result.get("returncode", -1) if validation_result else -1,
+            exec_cache_hit=validation_result.get("cached") if validation_result else None,
+            generation_token_usage=loop.gen_token_usage,
+            review_token_usage=review_token_usage,
+            candidate=loop.candidate,
+            generation_duration=round(loop.generation_duration.total_seconds(), 2),
+            evaluation_duration=round(evaluation_duration.total_seconds(), 2),
+        )
+        if review_result.label.lower() == "correct":
+            print(f"[INFO] Review passed on iteration {loop.review_iter + 1}")
+            loop.next_step = None
+            return
+        print(f"[FAIL] Review failed. Refining buggy code.")
+        loop.next_step = "refine_review"
+
+    def _refine_review(self, loop: CodeLoop):
+        loop.timed(self.code_agent.refine_buggy_code_reviewed, loop.messages, loop.review_result)
+        clean_code_fields(loop.parsed, ["buggy_code"])
+        loop.review_iter += 1
+        if loop.review_iter >= loop.max_review_iter:
+            print("[INFO] Review limit reached. Stopping.")
+            loop.next_step = None
+            return
+
+        if loop.exec_iter >= loop.max_exec_iter:
+            print("[INFO] Execution limit reached after review. Stopping.")
+            loop.next_step = None
+            return
+
+        loop.next_step = "validate"
+        loop.review_result = None
+        loop.validation_result = None
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List
 from src.agents.buggy_thought_generator import BuggyThoughtGeneratorAgent
@@ -13,10 +14,16 @@ class BuggyThoughtGeneratorPipeline:
         self.loggers = loggers
 
     def run(self, post):
-        buggy_code_intent, buggy_code_intent_result = self.generate_and_evaluate_buggy_code_intent(post)
-        buggy_functional_requirements, buggy_functional_requirements_result = self.generate_and_evaluate_buggy_functional_requirements(
-            post)
-        buggy_scot, buggy_scot_result = self.generate_and_evaluate_buggy_scot(post)
+        # the three artifacts only depend on the question, so their generate/judge/refine loops run side by side
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            code_intent_future = executor.submit(self.generate_and_evaluate_buggy_code_intent, post)
+            functional_requirements_future = executor.submit(
+                self.generate_and_evaluate_buggy_functional_requirements, post)
+            scot_future = executor.submit(self.generate_and_evaluate_buggy_scot, post)
+
+            buggy_code_intent, buggy_code_intent_result = code_intent_future.result()
+            buggy_functional_requirements, buggy_functional_requirements_result = functional_requirements_future.result()
+            buggy_scot, buggy_scot_result = scot_future.result()
 
         guidance = {
             "question_id": post["question_id"],
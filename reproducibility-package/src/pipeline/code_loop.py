@@ -0,0 +1,125 @@
+import copy
+from datetime import datetime
+
+from src.pipeline.speculation import Speculator
+
+# which kind of work each step of the loop is, i.e. the stage of the staged runner that executes it
+STEP_STAGES = {
+    "generate": "code",
+    "refine_execution": "code",
+    "refine_review": "code",
+    "validate": "validation",
+    "review": "review",
+    "benchmark": "benchmark",
+}
+# steps that produce a new script, run speculatively (k candidates at once) when enabled
+CODE_STEPS = ("generate", "refine_execution", "refine_review")
+
+
+class CodeLoop:
+    """State of one post's generate -> validate -> review -> refine loop.
+
+    The loop is advanced one step at a time by its pipeline (`pipeline.advance(loop)`), each step setting
+    `next_step`, so a sequential caller can run it to the end while the staged runner hands every step to
+    the worker pool of its kind (LLM generation, sandbox validation, judge review).
+    """
+
+    def __init__(self, post, guidance, max_exec_iter: int = 3, max_review_iter: int = 3):
+        self.post = post
+        self.guidance = guidance
+        self.max_exec_iter = max_exec_iter
+        self.max_review_iter = max_review_iter
+
+        self.messages = None
+        self.parsed = None
+        self.gen_token_usage = None
+        self.generation_duration = None
+        self.validation_result = None
+        self.review_result = None
+        self.docker_error_msg = ""
+        self.exec_iter = 0
+        self.review_iter = 0
+        self.next_step = "generate"
+        # speculative candidate this state belongs to, and its sampling overrides (temperature, seed)
+        self.candidate = 0
+        self.sampling = {}
+
+    @property
+    def done(self) -> bool:
+        return self.next_step is None
+
+    @property
+    def stage(self) -> str:
+        return STEP_STAGES[self.next_step]
+
+    def timed(self, call, *args):
+        """Runs a generator call and records its duration."""
+        start = datetime.now()
+        self.messages, self.parsed, self.gen_token_usage = call(*args, **self.sampling)
+        self.generation_duration = datetime.now() - start
+
+    def fork(self, candidate: int, sampling: dict) -> "CodeLoop":
+        """Copy of the loop for a speculative candidate, with its own message history."""
+        fork = copy.copy(self)
+        fork.messages = list(self.messages) if self.messages is not None else None
+        fork.candidate = candidate
+        fork.sampling = sampling
+        return fork
+
+    def adopt(self, fork: "CodeLoop"):
+        """Takes over the state of the winning candidate."""
+        self.__dict__.update(fork.__dict__)
+        self.sampling = {}
+
+
+class CodeLoopPipeline:
+    """Drives CodeLoops: each step is a `_<step>(loop)` method of the pipeline.
+
+    With a speculator of k > 1 candidates, every code step runs on k forks of the loop at once, each fork
+    validating its own script; the first one that executes cleanly goes on to review.
+    """
+    speculator = Speculator()
+
+    def advance(self, loop: CodeLoop):
+        print(f"[DEBUG] [{self.LOOP_NAME}] exec_iter={loop.exec_iter}, review_iter={loop.review_iter}, "
+              f"step={loop.next_step}")
+        if self.speculator.enabled and loop.next_step in CODE_STEPS:
+            self._speculate(loop)
+        else:
+            getattr(self, f"_{loop.next_step}")(loop)
+
+    def _speculate(self, loop: CodeLoop):
+        step = loop.next_step
+        forks = [loop.fork(i, self.speculator.sampling(i)) for i in range(self.speculator.candidates)]
+        winner = self.speculator.run(
+            self.LOOP_NAME, forks,
+            attempt=lambda fork, cancelled: self._attempt(fork, step, cancelled),
+            accepted=lambda fork: fork.next_step != "refine_execution",
+            discard=self._discard,
+        )
+        if winner.next_step == "review":
+            print(f"[INFO] [{self.LOOP_NAME}] candidate {winner.candidate + 1}/{len(forks)} executed first")
+        loop.adopt(winner)
+
+    def _attempt(self, fork: CodeLoop, step: str, cancelled) -> CodeLoop:
+        getattr(self, f"_{step}")(fork)
+        if fork.next_step == "validate":
+            if cancelled.is_set():
+                # lost while generating, it never reaches the sandbox
+                fork.validation_result, fork.docker_error_msg = None, ""
+            else:
+                self._validate(fork)
+        return fork
+
+    def _discard(self, fork: CodeLoop):
+        # a failed sandbox run was logged by _validate already
+        if fork.next_step != "refine_execution":
+            self._log_execution(fork, "discarded", "speculative candidate, another candidate executed first")
+
+    def close(self):
+        self.speculator.close()
+
+    def run_loop(self, loop: CodeLoop) -> CodeLoop:
+        while not loop.done:
+            self.advance(loop)
+        return loop
@@ -10,185 +10,323 @@ from src.agents.buggy_thought_generator import BuggyThoughtGeneratorAgent
 from src.agents.judge.judge import JudgeAgent
 from src.agents.patched_code_generator import PatchedCodeGeneratorAgent
 from src.agents.patched_thought_generator import PatchedThoughtGeneratorAgent
-from src.config.loader import ConfigLoader
+from src.config.registry import get_config
 from src.llm.base import LLMClient
+from src.models.llm_response_format import PatchedCodeGenerationResult, JudgeResult
 from src.llm.prompt_loader import PromptLoader
 from pprint import pprint
 from pprint import pprint
 
 from src.pipeline.buggy_thought_pipeline import BuggyThoughtGeneratorPipeline
+from src.pipeline.code_loop import CodeLoop, CodeLoopPipeline
 from src.pipeline.patched_thought_pipeline import PatchedThoughtGeneratorPipeline
+from src.pipeline.speculation import Speculator
 from src.utils.helper import clean_code_fields, is_error, summarize_docker_error
-from src.validator.docker_validator import DockerValidator
+from src.validator.factory import ValidatorFactory
 
 
-class PatchedCodeGenerationPipeline:
+class PatchedCodeGenerationPipeline(CodeLoopPipeline):
+    LOOP_NAME = "PATCHED CODE"
+
     # todo: use logger
     def __init__(self, generator_llm: LLMClient, judge_llm: LLMClient,
-                 loggers: dict, posts=None):
-        cfg = ConfigLoader()
+                 loggers: dict, posts=None, journal=None):
+        cfg = get_config()
         self.posts = posts
+        self.journal = journal
         self.loggers = loggers
         self.thought_agent = PatchedThoughtGeneratorAgent(generator_llm)
         self.judge_agent = JudgeAgent(judge_llm)
         self.code_agent = PatchedCodeGeneratorAgent(generator_llm)
         self.thought_pipeline = PatchedThoughtGeneratorPipeline(generator_llm, judge_llm, loggers, posts)
-        self.docker_template_path = cfg.root_dir / "src/utils/docker_template/Dockerfile.template"
-        self.validator = DockerValidator(self.docker_template_path)
+        self.validator = ValidatorFactory(cfg).get_validator()
+        self.speculator = Speculator.from_config(cfg.get("speculation"))
+        # optional performance oracle, runs after the judge accepted the patch
+        self.benchmark_config = cfg.get("sandbox").get("benchmark") or {}
+        self.speedups = []
+        self.benchmarks_skipped = 0
+
+    def run(self, post, checkpoint: dict = None):
+        """Runs the thought and code stages of a post, reusing the artifacts of stages in `checkpoint`."""
+        checkpoint = checkpoint or {}
+        print(f"Evaluating question id: {post['question_id']}")
+
+        guidance = self.thoughts(post, checkpoint)
+        restored = self.restored_code(post, checkpoint)
+        if restored is not None:
+            return restored
+        return self.complete(self.run_loop(CodeLoop(post, guidance)))
 
-    def run(self, post):
+    def thoughts(self, post, checkpoint: dict) -> dict:
         question_id = post['question_id']
-        print(f"Evaluating question id: {question_id}")
+        if "patched_thoughts" in checkpoint:
+            print(f"[RESUME] Reusing accepted patched thoughts for {question_id}")
+            return {
+                key: JudgeResult(**value) if key.endswith("_judgment") else value
+                for key, value in checkpoint["patched_thoughts"].items()
+            }
         guidance = self.thought_pipeline.run(post)
-        patched_code, patched_code_judgement = self.generate_and_evaluate_patched_code(post, guidance)
+        if self.journal is not None:
+            self.journal.record(question_id, "patched_thoughts", guidance)
+        return guidance
+
+    def restored_code(self, post, checkpoint: dict):
+        if "patched_code" not in checkpoint:
+            return None
+        print(f"[RESUME] Reusing patched code for {post['question_id']}")
+        return (PatchedCodeGenerationResult(**checkpoint["patched_code"]["result"]),
+                JudgeResult(**checkpoint["patched_code"]["judgement"]))
+
+    def complete(self, loop: CodeLoop):
+        """Result of a finished loop, journaled as the post's patched_code stage."""
+        patched_code, patched_code_judgement = self.loop_result(loop)
+        if self.journal is not None:
+            self.journal.record(loop.post["question_id"], "patched_code",
+                                {"result": patched_code, "judgement": patched_code_judgement})
         return patched_code, patched_code_judgement
 
     def generate_and_evaluate_patched_code(self, post: dict, guidance, max_exec_iter=3, max_review_iter=3):
-        question_id = post["question_id"]
-        buggy_code = post["buggy_code"]
-        question = post["question"]
-        answer = post["answer"]
-
-        generation_start_time = datetime.now()
-        messages, parsed, gen_token_usage = self.code_agent.generate_patched_code(buggy_code, guidance)
-        generation_end_time = datetime.now()
-        generation_duration = generation_end_time - generation_start_time
-
-        clean_code_fields(parsed, ["patched_code"])
-
-        validation_result = None
-        review_result = None
-
-        exec_iter, review_iter = 0, 0
-        phase = "execution"
-        docker_error_msg = ""
-
-        while exec_iter < max_exec_iter or review_iter < max_review_iter:
-            print(f"[DEBUG] [PATCHED CODE] exec_iter={exec_iter}, review_iter={review_iter}, phase={phase}")
-            # print(f"\n[ITERATION {exec_iter + review_iter + 1}] Phase: {phase}")
-
-            if phase == "execution" and exec_iter < max_exec_iter:
-                docker_error_msg = ""
-                try:
-                    validation_result = self.validator.validate(
-                        script=parsed.patched_code,
-                        requirements=parsed.requirements,
-                    )
-                    print("Validation result:")
-                    pprint(validation_result)
-
-                    passed = not is_error(validation_result["stderr"])
-                    if passed:
-                        print(f"[INFO] passed on iteration: {exec_iter + 1}")
-                        phase = "review"
-                        continue
-                    else:
-                        print(f"[FAIL] Execution failed. Refining...")
-
-                except (subprocess.CalledProcessError, RuntimeError) as e:
-                    docker_error_msg = summarize_docker_error(str(e))
-                    print(f"[ERROR] Docker validation failed: {docker_error_msg}")
-                    validation_result = {
-                        "stdout": "",
-                        "stderr": docker_error_msg,
-                        "exit_code": -1,
-                    }
-                self.loggers["patched_code_logger"].append_row(
-                    question_id=question_id,
-                    question=post["question"],
-                    answer=post["answer"],
-                    buggy_code=post["buggy_code"],
-                    patched_code_intent=guidance['patched_code_intent'],
-                    patched_functional_requirements=guidance['patched_functional_requirements'],
-                    patched_scot=guidance['patched_scot'],
-                    patched_code=parsed.patched_code,
-                    stdout=validation_result.get("stdout", ""),
-                    judge_patched_code_label="not_reviewed",
-                    judge_patched_code_rational="execution phase only",
-                    requirements=parsed.requirements,
-                    stderr=validation_result.get("stderr", ""),
-                    error=docker_error_msg,
-                    exec_iteration=exec_iter + 1,
-                    review_iteration=review_iter,
-                    exit_code=validation_result.get("returncode", -1),
-                    generation_token_usage=gen_token_usage,
-                    generation_duration=round(generation_duration.total_seconds(), 2),
-                    # evaluation_duration=round(evaluation_duration.total_seconds(), 2),
-                )
-                # Only refine if failed or exception occurred
-                generation_start_time = datetime.now()
-                messages, parsed, gen_token_usage = self.code_agent.refine_patched_code(messages, {
-                    "requirements": parsed.requirements,
-                    "patched_code": parsed.patched_code,
-                    "stderr": validation_result.get("stderr", "") if validation_result else "",
-                    "docker_error": docker_error_msg or "No docker error"
-                })
-                generation_end_time = datetime.now()
-                generation_duration = generation_end_time - generation_start_time
-
-                clean_code_fields(parsed, ["patched_code"])
-                exec_iter += 1  # one-exec-refinement block
-
-            elif phase == "review" and review_iter < max_review_iter:
-                evaluation_start_time = datetime.now()
-                review_result, review_token_usage = self.judge_agent.evaluate_patched_code(question, answer,
-                                                                                           parsed.patched_code)
-                evaluation_end_time = datetime.now()
-                evaluation_duration = evaluation_end_time - evaluation_start_time
-
-                print(f"[JUDGE] label: {review_result.label}, rationale: {review_result.rationale}")
-                self.loggers["patched_code_logger"].append_row(
-                    question_id=question_id,
-                    question=question,
-                    answer=post["answer"],
-                    buggy_code=post["buggy_code"],
-                    patched_code_intent=guidance['patched_code_intent'],
-                    patched_functional_requirements=guidance['patched_functional_requirements'],
-                    patched_scot=guidance['patched_scot'],
-                    patched_code=parsed.patched_code,
-                    stdout=validation_result.get("stdout", "") if validation_result else "",
-                    judge_patched_code_label=review_result.label,
-                    judge_patched_code_rational=review_result.rationale,
-                    requirements=parsed.requirements,
-                    stderr=validation_result.get("stderr", "") if validation_result else "",
-                    exit_code=validation_result.get("returncode", -1) if validation_result else -1,
-                    exec_iteration=exec_iter,
-                    review_iteration=review_iter + 1,
-                    generation_token_usage=gen_token_usage,
-                    review_token_usage=review_token_usage,
-                    generation_duration=round(generation_duration.total_seconds(), 2),
-                    evaluation_duration=round(evaluation_duration.total_seconds(), 2),
-                )
-                if review_result.label.lower() == "correct":
-                    print(f"[INFO] Review passed on iteration {review_iter + 1}")
-                    break
-
-                print(f"[FAIL] Review failed. Refining patched code.")
-
-                generation_start_time = datetime.now()
-                messages, parsed, gen_token_usage = self.code_agent.refine_patched_code_reviewed(messages,
-                                                                                                 review_result)
-                generation_end_time = datetime.now()
-                generation_duration = generation_end_time - generation_start_time
-
-                clean_code_fields(parsed, ["patched_code"])
-                review_iter += 1
-                if review_iter >= max_review_iter:
-                    print("[INFO] Review limit reached. Stopping.")
-                    break
-
-                if exec_iter >= max_exec_iter:
-                    print("[INFO] Execution limit reached after review. Stopping.")
-                    break
-
-                phase = "execution"
-                validation_result = None
-                review_result = None
+        return self.loop_result(self.run_loop(CodeLoop(post, guidance, max_exec_iter, max_review_iter)))
+
+    @staticmethod
+    def loop_result(loop: CodeLoop):
+        if loop.review_result:
+            return loop.parsed, {"label": loop.review_result.label, "rationale": loop.review_result.rationale}
+        else:
+            return loop.parsed, {"label": "incorrect", "rationale": "Code did not execute successfully."}
+
+    def _generate(self, loop: CodeLoop):
+        loop.timed(self.code_agent.generate_patched_code, loop.post["buggy_code"], loop.guidance)
+        clean_code_fields(loop.parsed, ["patched_code"])
+        loop.next_step = "validate"
+
+    def _validate(self, loop: CodeLoop):
+        post, guidance, parsed = loop.post, loop.guidance, loop.parsed
+        loop.docker_error_msg = ""
+        try:
+            loop.validation_result = self.validator.validate(
+                script=parsed.patched_code,
+                requirements=parsed.requirements,
+            )
+            print("Validation result:")
+            pprint(loop.validation_result)
+
+            passed = not is_error(loop.validation_result["stderr"])
+            if passed:
+                print(f"[INFO] passed on iteration: {loop.exec_iter + 1}")
+                loop.next_step = "review"
+                return
             else:
-                print("[WARN] No valid phase to execute, terminating loop.")
-                break
+                print(f"[FAIL] Execution failed. Refining...")
+
+        except (subprocess.CalledProcessError, RuntimeError) as e:
+            loop.docker_error_msg = summarize_docker_error(str(e))
+            print(f"[ERROR] Docker validation failed: {loop.docker_error_msg}")
+            loop.validation_result = {
+                "stdout": "",
+                "stderr": loop.docker_error_msg,
+                "exit_code": -1,
+            }
+        self._log_execution(loop, "not_reviewed", "execution phase only")
+        # Only refine if failed or exception occurred
+        loop.next_step = "refine_execution"
+
+    def _log_execution(self, loop: CodeLoop, label: str, rationale: str):
+        """Trace row of a generated script that was not reviewed (failed to execute, or discarded)."""
+        post, guidance, parsed = loop.post, loop.guidance, loop.parsed
+        validation_result = loop.validation_result or {}
+        self.loggers["patched_code_logger"].append_row(
+            question_id=post["question_id"],
+            question=post["question"],
+            answer=post["answer"],
+            buggy_code=post["buggy_code"],
+            patched_code_intent=guidance['patched_code_intent'],
+            patched_functional_requirements=guidance['patched_functional_requirements'],
+            patched_scot=guidance['patched_scot'],
+            patched_code=parsed.patched_code,
+            stdout=validation_result.get("stdout", ""),
+            row_kind="execution",
+            judge_patched_code_label=label,
+            judge_patched_code_rational=rationale,
+            requirements=parsed.requirements,
+            stderr=validation_result.get("stderr", ""),
+            error=loop.docker_error_msg,
+            exec_iteration=loop.exec_iter + 1,
+            review_iteration=loop.review_iter,
+            exit_code=validation_result.get("returncode", -1),
+            exec_cache_hit=validation_result.get("cached"),
+            generation_token_usage=loop.gen_token_usage,
+            candidate=loop.candidate,
+            generation_duration=round(loop.generation_duration.total_seconds(), 2),
+            # evaluation_duration=round(evaluation_duration.total_seconds(), 2),
+        )
 
-        if review_result:
-            return parsed, {"label": review_result.label, "rationale": review_result.rationale}
+    def _refine_execution(self, loop: CodeLoop):
+        loop.timed(self.code_agent.refine_patched_code, loop.messages, {
+            "requirements": loop.parsed.requirements,
+            "patched_code": loop.parsed.patched_code,
+            "stderr": loop.validation_result.get("stderr", "") if loop.validation_result else "",
+            "docker_error": loop.docker_error_msg or "No docker error"
+        })
+        clean_code_fields(loop.parsed, ["patched_code"])
+        loop.exec_iter += 1  # one-exec-refinement block
+        if loop.exec_iter < loop.max_exec_iter:
+            loop.next_step = "validate"
         else:
-            return parsed, {"label": "incorrect", "rationale": "Code did not execute successfully."}
+            print("[WARN] No valid phase to execute, terminating loop.")
+            loop.next_step = None
+
+    def _review(self, loop: CodeLoop):
+        post, guidance, parsed, validation_result = loop.post, loop.guidance, loop.parsed, loop.validation_result
+        evaluation_start_time = datetime.now()
+        review_result, review_token_usage = self.judge_agent.evaluate_patched_code(post["question"], post["answer"],
+                                                                                   parsed.patched_code)
+        evaluation_end_time = datetime.now()
+        evaluation_duration = evaluation_end_time - evaluation_start_time
+        loop.review_result = review_result
+
+        print(f"[JUDGE] label: {review_result.label}, rationale: {review_result.rationale}")
+        self.loggers["patched_code_logger"].append_row(
+            question_id=post["question_id"],
+            question=post["question"],
+            answer=post["answer"],
+            buggy_code=post["buggy_code"],
+            patched_code_intent=guidance['patched_code_intent'],
+            patched_functional_requirements=guidance['patched_functional_requirements'],
+            patched_scot=guidance['patched_scot'],
+            patched_code=parsed.patched_code,
+            stdout=validation_result.get("stdout", "") if validation_result else "",
+            row_kind="review",
+            judge_patched_code_label=review_result.label,
+            judge_patched_code_rational=review_result.rationale,
+            requirements=parsed.requirements,
+            stderr=validation_result.get("stderr", "") if validation_result else "",
+            exit_code=validation_result.get("returncode", -1) if validation_result else -1,
+            exec_cache_hit=validation_result.get("cached") if validation_result else None,
+            exec_iteration=loop.exec_iter,
+            review_iteration=loop.review_iter + 1,
+            generation_token_usage=loop.gen_token_usage,
+            review_token_usage=review_token_usage,
+            candidate=loop.candidate,
+            generation_duration=round(loop.generation_duration.total_seconds(), 2),
+            evaluation_duration=round(evaluation_duration.total_seconds(), 2),
+        )
+        if review_result.label.lower() == "correct":
+            print(f"[INFO] Review passed on iteration {loop.review_iter + 1}")
+            loop.next_step = "benchmark" if self.benchmark_config.get("enabled", False) else None
+            return
+
+        print(f"[FAIL] Review failed. Refining patched code.")
+        loop.next_step = "refine_review"
+
+    def _benchmark(self, loop: CodeLoop):
+        """Times the buggy script and the accepted patch under the same conditions, one row per input scale."""
+        post, parsed = loop.post, loop.parsed
+        loop.next_step = None
+        if post.get("buggy_requirements") is None:
+            # run on its own, the patched pipeline gets the buggy script without the environment it ran in;
+            # timing it in the patch's environment would not compare like with like (or not run at all)
+            reason = "the buggy script's requirements are unknown, benchmark skipped"
+            print(f"[BENCH] {reason}")
+            self.benchmarks_skipped += 1
+            self._log_benchmark(loop, summary=reason, error=reason)
+            return
+
+        bench = self.benchmark_config
+        options = dict(repeats=bench.get("repeats", 5), warmup=bench.get("warmup", 1), cpus=bench.get("cpus"),
+                       timeout=bench.get("timeout", 300))
+        scripts = {
+            "buggy": (post["buggy_code"], post["buggy_requirements"]),
+            "patched": (parsed.patched_code, parsed.requirements),
+        }
+        scales = list(bench.get("scales") or [1])
+        if scales != [1] and not all("BENCH_SCALE" in script for script, _ in scripts.values()):
+            # another scale would time one or both scripts on the same inputs again, or on different inputs
+            print("[BENCH] BENCH_SCALE is not read by both scripts, timing at scale 1 only")
+            scales = [1]
+        for i, scale in enumerate(scales):
+            results, error = {}, ""
+            # alternate which script runs first, so neither always gets the colder or the warmer machine
+            order = ["buggy", "patched"] if i % 2 == 0 else ["patched", "buggy"]
+            try:
+                for kind in order:
+                    script, requirements = scripts[kind]
+                    results[kind] = self.validator.benchmark(script, requirements, scale=scale, **options)
+            except (subprocess.CalledProcessError, RuntimeError, NotImplementedError) as e:
+                error = summarize_docker_error(str(e))
+                print(f"[ERROR] Benchmark failed: {error}")
+            buggy, patched = results.get("buggy", {}), results.get("patched", {})
+            if buggy.get("returncode") or patched.get("returncode"):
+                error = error or (f"benchmark runs failed (buggy exit code {buggy.get('returncode')}, "
+                                  f"patched exit code {patched.get('returncode')})")
+
+            speedup = None
+            if not error and buggy.get("median") and patched.get("median"):
+                speedup = round(buggy["median"] / patched["median"], 3)
+                self.speedups.append(speedup)
+                summary = (f"patched {speedup}x vs buggy (median {patched['median']:.4f}s vs {buggy['median']:.4f}s, "
+                           f"scale {scale})")
+            else:
+                summary = f"not comparable at scale {scale}"
+            print(f"[BENCH] {summary}")
+            self._log_benchmark(loop, summary, error, scale=scale, repeats=options["repeats"], buggy=buggy,
+                                patched=patched, speedup=speedup)
+
+    def _log_benchmark(self, loop: CodeLoop, summary: str, error: str, scale=None, repeats=None, buggy=None,
+                       patched=None, speedup=None):
+        post, guidance, parsed = loop.post, loop.guidance, loop.parsed
+        buggy, patched = buggy or {}, patched or {}
+        self.loggers["patched_code_logger"].append_row(
+            question_id=post["question_id"],
+            question=post["question"],
+            answer=post["answer"],
+            buggy_code=post["buggy_code"],
+            patched_code_intent=guidance['patched_code_intent'],
+            patched_functional_requirements=guidance['patched_functional_requirements'],
+            patched_scot=guidance['patched_scot'],
+            patched_code=parsed.patched_code,
+            row_kind="benchmark",
+            judge_patched_code_rational=summary,
+            requirements=parsed.requirements,
+            error=error,
+            exec_iteration=loop.exec_iter,
+            review_iteration=loop.review_iter + 1,
+            exit_code=patched.get("returncode", -1),
+            candidate=loop.candidate,
+            bench_scale=scale,
+            bench_repeats=repeats,
+            buggy_time_median=buggy.get("median"),
+            buggy_time_stdev=buggy.get("stdev"),
+            buggy_peak_rss_mb=buggy.get("peak_rss_mb"),
+            patched_time_median=patched.get("median"),
+            patched_time_stdev=patched.get("stdev"),
+            patched_peak_rss_mb=patched.get("peak_rss_mb"),
+            speedup=speedup,
+        )
+
+    def benchmark_summary(self) -> str:
+        speedups = sorted(self.speedups)
+        skipped = f", {self.benchmarks_skipped} skipped (buggy requirements unknown)" if self.benchmarks_skipped else ""
+        if not speedups:
+            return "no comparable benchmarks" + skipped
+        faster = sum(speedup > 1 for speedup in speedups)
+        return (f"{len(speedups)} comparisons, patch faster in {faster}, "
+                f"median speedup {speedups[len(speedups) // 2]:.2f}x{skipped}")
+
+    def _refine_review(self, loop: CodeLoop):
+        loop.timed(self.code_agent.refine_patched_code_reviewed, loop.messages, loop.review_result)
+        clean_code_fields(loop.parsed, ["patched_code"])
+        loop.review_iter += 1
+        if loop.review_iter >= loop.max_review_iter:
+            print("[INFO] Review limit reached. Stopping.")
+            loop.next_step = None
+            return
+
+        if loop.exec_iter >= loop.max_exec_iter:
+            print("[INFO] Execution limit reached after review. Stopping.")
+            loop.next_step = None
+            return
+
+        loop.next_step = "validate"
+        loop.validation_result = None
+        loop.review_result = None
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List
 from src.agents.judge.judge import JudgeAgent
@@ -14,11 +15,17 @@ class PatchedThoughtGeneratorPipeline:
         self.loggers = loggers
 
     def run(self, post):
+        # the three artifacts only depend on the question and answer, so their loops run side by side
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            code_intent_future = executor.submit(self.generate_and_evaluate_patched_code_intent, post)
+            functional_requirements_future = executor.submit(
+                self.generate_and_evaluate_patched_functional_requirements, post)
+            scot_future = executor.submit(self.generate_and_evaluate_patched_scot, post)
+
+            patched_code_intent, patched_code_intent_result = code_intent_future.result()
+            patched_functional_requirements, patched_functional_requirements_result = functional_requirements_future.result()
+            patched_scot, patched_scot_result = scot_future.result()
 
-        patched_code_intent, patched_code_intent_result = self.generate_and_evaluate_patched_code_intent(post)
-        patched_functional_requirements, patched_functional_requirements_result = self.generate_and_evaluate_patched_functional_requirements(
-            post)
-        patched_scot, patched_scot_result = self.generate_and_evaluate_patched_scot(post)
         guidance = {
             "question_id": post["question_id"],
             "patched_code_intent": patched_code_intent,
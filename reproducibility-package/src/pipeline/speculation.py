@@ -0,0 +1,127 @@
+import json
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class SpeculationStats:
+    """Per-loop totals of the speculative rounds, for the end-of-run summary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(lambda: defaultdict(int))
+
+    def add(self, loop_name: str, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self._totals[loop_name][name] += value
+
+    def loops(self) -> list:
+        with self._lock:
+            return sorted(self._totals)
+
+    def summary(self, loop_name: str) -> str:
+        with self._lock:
+            totals = dict(self._totals.get(loop_name, {}))
+        if not totals.get("rounds"):
+            return "no speculative rounds"
+        return (f"{totals['rounds']} rounds, {totals.get('won', 0)} won by an extra candidate, "
+                f"{totals.get('none_passed', 0)} without a clean run, {totals.get('cancelled', 0)} candidates "
+                f"cancelled before starting, {totals.get('discarded', 0)} discarded after the winner, "
+                f"{totals.get('extra_tokens', 0)} tokens spent on losing candidates")
+
+
+stats = SpeculationStats()
+
+
+def _total_tokens(token_usage) -> int:
+    # the agents hand usage over as a JSON string
+    if isinstance(token_usage, str):
+        token_usage = json.loads(token_usage) if token_usage else None
+    return int((token_usage or {}).get("total_tokens") or 0)
+
+
+class Speculator:
+    """Runs k candidates of a code step concurrently and keeps the first one that executes cleanly.
+
+    Candidate 0 uses the model profile's sampling settings, i.e. it is the answer a sequential run gets
+    (and hits its LLM cache entries); the others are sampled at `temperature` with their own seed. Losers
+    that have not started are cancelled, running ones skip their sandbox run once a winner exists, and
+    whatever they still produce is handed to `discard` so their tokens show up in the traces.
+    """
+
+    def __init__(self, candidates: int = 1, temperature: float = 0.7, max_workers: int = 8):
+        self.candidates = max(1, int(candidates))
+        self.temperature = temperature
+        self.executor = ThreadPoolExecutor(max(1, int(max_workers)), thread_name_prefix="speculation") \
+            if self.candidates > 1 else None
+
+    @classmethod
+    def from_config(cls, speculation_cfg) -> "Speculator":
+        if not speculation_cfg:
+            return cls()
+        return cls(candidates=speculation_cfg.get("candidates", 1),
+                   temperature=speculation_cfg.get("temperature", 0.7),
+                   max_workers=speculation_cfg.get("max_workers", 8))
+
+    @property
+    def enabled(self) -> bool:
+        return self.executor is not None
+
+    def sampling(self, index: int) -> dict:
+        if index == 0:
+            return {}
+        return {"temperature": self.temperature, "seed": 42 + index}
+
+    def run(self, loop_name: str, forks: list, attempt, accepted, discard):
+        """Runs `attempt(fork, cancelled)` for every fork; returns the first fork `accepted` by the caller.
+
+        Without an accepted fork the lowest-index one that finished is returned, and if every attempt
+        raised, the first exception is re-raised.
+        """
+        cancelled = threading.Event()
+        futures = {self.executor.submit(attempt, fork, cancelled): fork for fork in forks}
+        winner, finished, errors = None, [], []
+        for future in as_completed(futures):
+            if future.exception() is not None:
+                errors.append((futures[future].candidate, future.exception()))
+                continue
+            fork = future.result()
+            if accepted(fork):
+                winner = fork
+                break
+            finished.append(fork)
+
+        extra_tokens = sum(_total_tokens(fork.gen_token_usage) for fork in finished if fork is not winner)
+        if winner is None:
+            if not finished:
+                raise min(errors, key=lambda error: error[0])[1]
+            winner = min(finished, key=lambda fork: fork.candidate)
+            extra_tokens -= _total_tokens(winner.gen_token_usage)
+            stats.add(loop_name, rounds=1, none_passed=1, extra_tokens=extra_tokens)
+            return winner
+
+        cancelled.set()
+        stats.add(loop_name, rounds=1, won=int(winner.candidate != 0), extra_tokens=extra_tokens)
+        for future, fork in futures.items():
+            if fork is winner or fork in finished:
+                continue
+            if future.cancel():
+                stats.add(loop_name, cancelled=1)
+            else:
+                # runs right away for attempts that finished while the winner was being picked
+                future.add_done_callback(lambda done, name=loop_name: self._settle(done, name, discard))
+        return winner
+
+    @staticmethod
+    def _settle(future, loop_name: str, discard):
+        # a loser that was already running when the winner was picked
+        if future.cancelled() or future.exception() is not None:
+            return
+        fork = future.result()
+        stats.add(loop_name, discarded=1, extra_tokens=_total_tokens(fork.gen_token_usage))
+        discard(fork)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,98 @@
+from src.pipeline.buggy_code_generation_pipeline import BuggyCodeGenerationPipeline
+from src.pipeline.code_loop import CodeLoop
+from src.pipeline.patched_code_generation_pipeline import PatchedCodeGenerationPipeline
+from src.pipeline.staged_runner import StagedRunner
+
+STAGES = ("buggy_thoughts", "buggy_code", "validation", "review", "patched_thoughts", "patched_code", "benchmark")
+
+
+class PostJob:
+    """A post on its way through the stages, with the code loop it is currently in."""
+
+    def __init__(self, idx: int, post, checkpoint: dict):
+        self.idx = idx
+        self.post = post
+        self.question_id = post["question_id"]
+        self.checkpoint = checkpoint
+        self.start_time = None
+        self.kind = None
+        self.pipeline = None
+        self.loop = None
+
+
+class StagedPostPipeline:
+    """Runs posts through the buggy and patched pipelines as overlapping stages.
+
+    Thought generation, code generation and refinement, sandbox validation and judge review each get
+    their own worker pool, so a post waiting for its Docker run does not hold up LLM work for the
+    others, and vice versa. Validation and review serve both the buggy and the patched loops. Stages
+    journal exactly what `run()` of the two pipelines journals, so --resume works the same.
+    """
+
+    def __init__(self, buggy_pipeline: BuggyCodeGenerationPipeline, patched_pipeline: PatchedCodeGenerationPipeline,
+                 journal=None, workers: dict = None, max_in_flight: int = 8, report_interval: float = 0):
+        self.buggy_pipeline = buggy_pipeline
+        self.patched_pipeline = patched_pipeline
+        self.journal = journal
+        workers = workers or {}
+        handlers = {
+            "buggy_thoughts": self._buggy_thoughts,
+            "patched_thoughts": self._patched_thoughts,
+        }
+        self.runner = StagedRunner(max_in_flight, report_interval)
+        for stage in STAGES:
+            self.runner.add_stage(stage, handlers.get(stage, self._code_step), workers.get(stage, 1))
+
+    def run(self, jobs, on_admit=None, on_done=None):
+        self.runner.run(jobs, "buggy_thoughts", on_admit=on_admit, on_done=on_done)
+
+    def _buggy_thoughts(self, job: PostJob):
+        print(f"Evaluating question id: {job.question_id}")
+        guidance = self.buggy_pipeline.thoughts(job.post, job.checkpoint)
+        restored = self.buggy_pipeline.restored_code(job.post, job.checkpoint)
+        if restored is not None:
+            return self._after_buggy(job, *restored)
+        return self._start_loop(job, "buggy", self.buggy_pipeline, guidance)
+
+    def _patched_thoughts(self, job: PostJob):
+        guidance = self.patched_pipeline.thoughts(job.post, job.checkpoint)
+        restored = self.patched_pipeline.restored_code(job.post, job.checkpoint)
+        if restored is not None:
+            return self._post_done(job)
+        return self._start_loop(job, "patched", self.patched_pipeline, guidance)
+
+    def _start_loop(self, job: PostJob, kind: str, pipeline, guidance) -> str:
+        job.kind, job.pipeline, job.loop = kind, pipeline, CodeLoop(job.post, guidance)
+        return self._next_stage(job)
+
+    def _code_step(self, job: PostJob):
+        job.pipeline.advance(job.loop)
+        if not job.loop.done:
+            return self._next_stage(job)
+        code, judgement = job.pipeline.complete(job.loop)
+        job.loop = None
+        if job.kind == "buggy":
+            return self._after_buggy(job, code, judgement)
+        return self._post_done(job)
+
+    @staticmethod
+    def _next_stage(job: PostJob) -> str:
+        stage = job.loop.stage
+        return f"{job.kind}_code" if stage == "code" else stage
+
+    def _after_buggy(self, job: PostJob, buggy_code_generation, buggy_code_judgement):
+        if isinstance(buggy_code_judgement, dict):
+            buggy_code_label = buggy_code_judgement.get("label", "").lower()
+        else:
+            buggy_code_label = buggy_code_judgement.label.lower()
+
+        if buggy_code_label == "correct":
+            job.post['buggy_code'] = buggy_code_generation.buggy_code
+            job.post['buggy_requirements'] = buggy_code_generation.requirements
+            return "patched_thoughts"
+        return self._post_done(job)
+
+    def _post_done(self, job: PostJob):
+        if self.journal is not None:
+            self.journal.record(job.question_id, "post_done")
+        return None
@@ -0,0 +1,156 @@
+import queue
+import threading
+import time
+import traceback
+
+_STOP = object()
+
+
+class Stage:
+    """One stage of a StagedRunner: a bounded queue served by its own pool of worker threads."""
+
+    def __init__(self, name: str, handler, workers: int, capacity: int):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.queue = queue.Queue(maxsize=capacity)
+        self._lock = threading.Lock()
+        self.busy = 0
+        self.busy_seconds = 0.0
+        self.processed = 0
+        self.max_depth = 0
+        self._depth_total = 0
+
+    def put(self, job):
+        # never blocks, see StagedRunner
+        self.queue.put_nowait(job)
+        depth = self.queue.qsize()
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+
+    def started(self):
+        with self._lock:
+            self.busy += 1
+
+    def finished(self, seconds: float):
+        with self._lock:
+            self.busy -= 1
+            self.busy_seconds += seconds
+            self.processed += 1
+
+    def summary(self, elapsed: float) -> str:
+        with self._lock:
+            utilization = self.busy_seconds / (self.workers * elapsed) if elapsed > 0 else 0.0
+            mean_depth = self._depth_total / self.processed if self.processed else 0.0
+            return (f"{self.processed} steps, {self.workers} workers, {utilization:.0%} utilization, "
+                    f"queue depth max {self.max_depth} / mean {mean_depth:.1f}")
+
+
+class StagedRunner:
+    """Moves jobs through stages that each have their own worker pool and bounded queue.
+
+    A handler returns the name of the stage the job goes to next, or None once the job is finished.
+    Stages may form cycles (validate -> refine -> validate), so workers must never block when handing a
+    job on: admission control lets at most `max_in_flight` jobs into the pipeline, and since every queue
+    holds `max_in_flight` jobs and a job sits in one queue at a time, a put can never find its queue full.
+    Back-pressure is applied only to the producer, which waits for a finished job before admitting the
+    next one.
+    """
+
+    def __init__(self, max_in_flight: int, report_interval: float = 0):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.report_interval = report_interval
+        self.stages = {}
+        self._admission = threading.BoundedSemaphore(self.max_in_flight)
+        self._in_flight = 0
+        self._idle = threading.Condition()
+        self._on_done = None
+        self.elapsed = 0.0
+
+    def add_stage(self, name: str, handler, workers: int):
+        self.stages[name] = Stage(name, handler, workers, capacity=self.max_in_flight)
+
+    def run(self, jobs, first_stage: str, on_admit=None, on_done=None):
+        """Feeds `jobs` into `first_stage` and returns once all of them finished.
+
+        `on_admit(job)` runs when a job enters the pipeline, `on_done(job, error)` when it leaves it,
+        with the exception of the handler that failed it, if any.
+        """
+        self._on_done = on_done
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._work, args=(stage,), name=f"{stage.name}-{i}", daemon=True)
+            for stage in self.stages.values() for i in range(stage.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        stop_reporting = threading.Event()
+        if self.report_interval:
+            threading.Thread(target=self._report, args=(stop_reporting,), daemon=True).start()
+
+        try:
+            for job in jobs:
+                self._admission.acquire()
+                with self._idle:
+                    self._in_flight += 1
+                try:
+                    if on_admit is not None:
+                        on_admit(job)
+                except Exception as e:
+                    self._finish(job, e)
+                    continue
+                self.stages[first_stage].put(job)
+
+            with self._idle:
+                while self._in_flight:
+                    self._idle.wait()
+        finally:
+            stop_reporting.set()
+            for stage in self.stages.values():
+                for _ in range(stage.workers):
+                    stage.queue.put(_STOP)
+            for thread in threads:
+                thread.join()
+            self.elapsed = time.perf_counter() - start
+
+    def _work(self, stage: Stage):
+        while True:
+            job = stage.queue.get()
+            if job is _STOP:
+                return
+            stage.started()
+            start = time.perf_counter()
+            try:
+                next_stage, error = stage.handler(job), None
+            except Exception as e:
+                next_stage, error = None, e
+            stage.finished(time.perf_counter() - start)
+            if next_stage is None:
+                self._finish(job, error)
+            else:
+                self.stages[next_stage].put(job)
+
+    def _finish(self, job, error):
+        try:
+            if self._on_done is not None:
+                self._on_done(job, error)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self._admission.release()
+            with self._idle:
+                self._in_flight -= 1
+                self._idle.notify_all()
+
+    def _report(self, stop: threading.Event):
+        while not stop.wait(self.report_interval):
+            print("[STAGES] " + " | ".join(self.status()))
+
+    def status(self) -> list:
+        """Current queue depth and busy workers of every stage."""
+        return [f"{stage.name} queued={stage.queue.qsize()} busy={stage.busy}/{stage.workers}"
+                for stage in self.stages.values()]
+
+    def summary(self) -> dict:
+        return {name: stage.summary(self.elapsed) for name, stage in self.stages.items()}
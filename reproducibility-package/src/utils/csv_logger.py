@@ -1,40 +1,150 @@
-import pandas as pd
-from pathlib import Path
-from datetime import datetime
-import json
+import atexit
 import csv
+import json
+import threading
+import time
+import weakref
+from datetime import datetime
+from pathlib import Path
 
+_open_loggers = weakref.WeakSet()
+_flusher_started = threading.Event()
 
-class CsvTraceLogger:
-    def __init__(self, base_dir: Path, tag: str = None, category: str = None, schema_path: Path = "./",
-                 timestamp: str = None,
-                 filename: str = None):
-        self.timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
-        if filename is None:
-            filename = f"execution_trace_{self.timestamp}.csv"
 
-        # self.csv_path = base_dir / "stack_overflow" / tag / category / "logs" / filename
-        self.csv_path = base_dir / "stack_overflow" / "logs" / filename
-        self.csv_path.parent.mkdir(parents=True, exist_ok=True)
+def _flush_periodically():
+    while True:
+        time.sleep(1.0)
+        for logger in list(_open_loggers):
+            logger.flush(only_if_due=True)
+
+
+def _close_all():
+    for logger in list(_open_loggers):
+        logger.close()
+
+
+atexit.register(_close_all)
+
+# columns filled from the usage JSON of the call they describe, unless the row sets them itself
+_FEW_SHOT_COLUMNS = {"few_shot_tokens": "generation_token_usage", "review_few_shot_tokens": "review_token_usage"}
+
+
+def _few_shot_tokens(token_usage) -> str:
+    try:
+        return json.loads(token_usage).get("few_shot_tokens", "")
+    except (TypeError, ValueError, AttributeError):
+        return ""
+
+
+class BufferedTraceLogger:
+    """Buffers schema-ordered rows and hands them to a sink in batches.
+
+    Rows are written once `flush_rows` rows are pending or `flush_interval` seconds have passed (a
+    background thread also flushes idle loggers). Safe to share between worker threads; everything
+    pending is written on close() and at interpreter exit. Subclasses implement `_write_rows` and
+    `_close_sink`.
+    """
+
+    def __init__(self, path: Path, schema_path: Path, flush_rows: int = 20, flush_interval: float = 5.0):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
 
         self.columns = self._load_schema(schema_path)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        # shared by all workers, guards the buffer and the sink
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+
+        _open_loggers.add(self)
+        if not _flusher_started.is_set():
+            _flusher_started.set()
+            threading.Thread(target=_flush_periodically, name="csv-trace-flusher", daemon=True).start()
 
     def _load_schema(self, schema_path: Path):
         with open(schema_path, "r", encoding="utf-8") as f:
             return json.load(f)
 
     def append_row(self, **kwargs):
-        row = {}
+        row = []
         for col in self.columns:
             if col == "timestamp":
-                row[col] = datetime.now().isoformat()
+                row.append(datetime.now().isoformat())
+            elif col in _FEW_SHOT_COLUMNS and col not in kwargs:
+                row.append(_few_shot_tokens(kwargs.get(_FEW_SHOT_COLUMNS[col])))
             else:
-                row[col] = kwargs.get(col, "")
-
-        df = pd.DataFrame([row])
-        if self.csv_path.exists():
-            df.to_csv(self.csv_path, mode="a", index=False, header=False, quoting=csv.QUOTE_ALL, lineterminator="\n",
-                      encoding="utf-8")
-        else:
-            df.to_csv(self.csv_path, mode="w", index=False, header=True, quoting=csv.QUOTE_ALL, lineterminator="\n",
-                      encoding="utf-8")
+                value = kwargs.get(col, "")
+                row.append("" if value is None else value)
+
+        with self._lock:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.flush_rows or self._flush_due():
+                self._flush_locked()
+
+    def _flush_due(self) -> bool:
+        return time.monotonic() - self._last_flush >= self.flush_interval
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        self._write_rows(self._buffer)
+        self._buffer.clear()
+
+    def _write_rows(self, rows: list):
+        raise NotImplementedError
+
+    def _close_sink(self):
+        raise NotImplementedError
+
+    def flush(self, only_if_due: bool = False):
+        with self._lock:
+            if only_if_due and not self._flush_due():
+                return
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._close_sink()
+
+
+class CsvTraceLogger(BufferedTraceLogger):
+    """Appends schema-ordered rows to one CSV file through a single open handle."""
+
+    def __init__(self, base_dir: Path, tag: str = None, category: str = None, schema_path: Path = "./",
+                 timestamp: str = None,
+                 filename: str = None, flush_rows: int = 20, flush_interval: float = 5.0):
+        self.timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        if filename is None:
+            filename = f"execution_trace_{self.timestamp}.csv"
+
+        self._file = None
+        self._writer = None
+        # self.csv_path = base_dir / "stack_overflow" / tag / category / "logs" / filename
+        super().__init__(base_dir / "stack_overflow" / "logs" / filename, schema_path,
+                         flush_rows=flush_rows, flush_interval=flush_interval)
+
+    @property
+    def csv_path(self) -> Path:
+        return self.path
+
+    def _write_rows(self, rows: list):
+        if self._file is None:
+            # opened on the first flush so loggers that never log leave no empty file behind;
+            # the header is only written for a new file, resumed runs keep appending
+            write_header = not self.path.exists() or self.path.stat().st_size == 0
+            self._file = open(self.path, "a", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file, quoting=csv.QUOTE_ALL, lineterminator="\n")
+            if write_header:
+                self._writer.writerow(self.columns)
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _close_sink(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+
+class DiskCache:
+    """Content-addressed JSON store: one file per key, sharded by key prefix.
+
+    Entries are evicted least recently used first (hits refresh the file mtime) once the cache grows
+    past `max_size_mb`, and expire after `ttl_seconds` when set.
+    """
+
+    def __init__(self, cache_dir: Path, max_size_mb: float = None, ttl_seconds: float = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._total_size = sum(p.stat().st_size for p in self.cache_dir.glob("*/*.json"))
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        if self.ttl_seconds and time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["value"]
+
+    def set(self, key: str, value):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"created_at": time.time(), "value": value}, default=str)
+
+        # write to a private file and rename, readers never see a partial entry
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_text(data, encoding="utf-8")
+        with self._lock:
+            previous_size = path.stat().st_size if path.exists() else 0
+            tmp_path.replace(path)
+            self._total_size += path.stat().st_size - previous_size
+        self._evict()
+
+    def _remove(self, path: Path):
+        with self._lock:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                self._total_size -= size
+            except OSError:
+                pass
+
+    def _evict(self):
+        if not self.max_size_bytes or self._total_size <= self.max_size_bytes:
+            return
+        with self._lock:
+            entries = []
+            for path in self.cache_dir.glob("*/*.json"):
+                try:
+                    stat = path.stat()
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                except OSError:
+                    continue
+            entries.sort()
+            self._total_size = sum(size for _, size, _ in entries)
+            # shrink to 90% so a full cache doesn't rescan on every write
+            target = int(self.max_size_bytes * 0.9)
+            for _, size, path in entries:
+                if self._total_size <= target:
+                    break
+                try:
+                    path.unlink()
+                    self._total_size -= size
+                except OSError:
+                    pass
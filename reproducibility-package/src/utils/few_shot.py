@@ -0,0 +1,138 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from src.utils.helper import estimate_message_tokens
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+
+
+def fingerprint(text: str) -> bytes:
+    """Hash of a question (or code) after the normalization used for duplicate matching."""
+    return hashlib.blake2b(text.strip().lower().encode("utf-8"), digest_size=16).digest()
+
+
+def _terms(text: str) -> list:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class FewShotIndex:
+    """A few-shot example set, preprocessed once for duplicate filtering and retrieval.
+
+    The lowercased user turns are computed up front, and the view for a question is computed on first use
+    and then served from an LRU keyed by the question's fingerprint, so every iteration and stage that sees
+    the same question reuses it. With `top_k` or `token_budget` set, the view keeps only the examples whose
+    user turns rank highest under BM25 against the question and fit the budget. Iterating yields the
+    messages themselves.
+    """
+
+    def __init__(self, messages, name: str = "examples", top_k: int = None, token_budget: int = None,
+                 max_views: int = 1024):
+        self.name = name
+        self.messages = tuple(dict(message) for message in messages)
+        self._user_contents = tuple(
+            message["content"].lower() if message["role"] == "user" else None for message in self.messages
+        )
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.max_views = max_views
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.total_tokens = estimate_message_tokens(self.messages)
+        self.calls = 0
+        self.tokens_sent = 0
+        if self.selective:
+            self._build_bm25()
+
+    @property
+    def selective(self) -> bool:
+        return self.top_k is not None or self.token_budget is not None
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def filter(self, text: str) -> list:
+        """Examples without the pair whose user turn contains `text`, so a post never sees itself as a shot."""
+        key = fingerprint(text)
+        with self._lock:
+            view = self._views.get(key)
+            if view is not None:
+                self._views.move_to_end(key)
+        if view is None:
+            view = self._build_view(text)
+            with self._lock:
+                self._views[key] = view
+                if len(self._views) > self.max_views:
+                    self._views.popitem(last=False)
+
+        if self.selective:
+            view_tokens = estimate_message_tokens(view)
+            with self._lock:
+                self.calls += 1
+                self.tokens_sent += view_tokens
+        return list(view)
+
+    def _build_view(self, text: str) -> tuple:
+        needle = text.strip().lower()
+        # a user turn and the assistant turn answering it form one example
+        groups = []
+        i = 0
+        while i < len(self.messages):
+            content = self._user_contents[i]
+            paired = (content is not None and i + 1 < len(self.messages)
+                      and self.messages[i + 1]["role"] == "assistant")
+            group = (i, i + 1) if paired else (i,)
+            if content is not None and needle in content:
+                print("few-shot example matched!!")
+            else:
+                groups.append(group)
+            i += len(group)
+        if self.selective:
+            groups = self._select(groups, text)
+        return tuple(self.messages[j] for group in groups for j in group)
+
+    def _build_bm25(self, k1: float = 1.5, b: float = 0.75):
+        self._k1, self._b = k1, b
+        self._term_counts = {i: Counter(_terms(content)) for i, content in enumerate(self._user_contents)
+                             if content is not None}
+        lengths = [sum(counts.values()) for counts in self._term_counts.values()]
+        self._avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        document_frequency = Counter(term for counts in self._term_counts.values() for term in counts)
+        n = len(self._term_counts)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()}
+
+    def _score(self, index: int, query_terms: list) -> float:
+        counts = self._term_counts.get(index)
+        if not counts:
+            return 0.0
+        length_norm = self._k1 * (1 - self._b + self._b * sum(counts.values()) / (self._avg_length or 1.0))
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if tf:
+                score += self._idf[term] * tf * (self._k1 + 1) / (tf + length_norm)
+        return score
+
+    def _select(self, groups: list, text: str) -> list:
+        query_terms = set(_terms(text))
+        ranked = sorted(groups, key=lambda group: -self._score(group[0], query_terms))
+        selected, used = [], 0
+        for group in ranked:
+            if self.top_k is not None and len(selected) >= self.top_k:
+                break
+            cost = estimate_message_tokens([self.messages[j] for j in group])
+            if self.token_budget is not None and used + cost > self.token_budget:
+                continue
+            selected.append(group)
+            used += cost
+        # keep the order of the example file, only the membership is decided by relevance
+        return sorted(selected)
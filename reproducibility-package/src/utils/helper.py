@@ -29,9 +29,10 @@ def strip_outer_double_braces(text: str) -> str:
     return stripped
 
 
-def trim_messages(messages: list[dict], max_pairs: int = 1) -> list[dict]:
+def trim_messages(messages: list[dict], max_pairs: int = 1, max_tokens: int = None) -> list[dict]:
     """Keeps system prompt + last N user-assistant message pairs,
-    optionally including a trailing user message if assistant hasn't replied yet."""
+    optionally including a trailing user message if assistant hasn't replied yet.
+    With `max_tokens`, older pairs are also dropped until the messages fit that many (estimated) tokens."""
 
     print("current message length:", len(messages))
 
@@ -49,13 +50,22 @@ def trim_messages(messages: list[dict], max_pairs: int = 1) -> list[dict]:
         dialog_body = dialog_messages
         trailing_user = None
 
+    # the system prompt and the newest user turn are always kept, the budget decides how much history fits
+    used = sum(count_message_tokens(m) for m in system_messages)
+    if trailing_user:
+        used += count_message_tokens(trailing_user)
+
     # Collect last N user-assistant pairs
     pairs = []
     i = len(dialog_body) - 1
     while i > 0 and len(pairs) < max_pairs:
         if dialog_body[i]["role"] == "assistant" and dialog_body[i - 1]["role"] == "user":
+            cost = count_message_tokens(dialog_body[i - 1]) + count_message_tokens(dialog_body[i])
+            if max_tokens is not None and used + cost > max_tokens:
+                break
             pairs.insert(0, dialog_body[i - 1])
             pairs.insert(1, dialog_body[i])
+            used += cost
             i -= 2
         else:
             i -= 1
@@ -65,10 +75,42 @@ def trim_messages(messages: list[dict], max_pairs: int = 1) -> list[dict]:
         pairs.append(trailing_user)
 
     filtered_messages = system_messages + pairs
-    print("filtered message length:", len(filtered_messages))
+    print("filtered message length:", len(filtered_messages),
+          f"(~{used} tokens)" if max_tokens is not None else "")
     return filtered_messages
 
 
+def truncate_middle(text: str, max_tokens: int, head_share: float = 0.5) -> str:
+    """Shortens oversized text to about `max_tokens` by cutting whole lines out of the middle.
+
+    `head_share` of the budget goes to the first lines, the rest to the last ones, so a traceback
+    (head_share ~0.2) keeps the command and the final error, and code keeps its imports and its end.
+    """
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text
+    head_budget = int(max_tokens * 4 * head_share)
+    tail_budget = max_tokens * 4 - head_budget
+    lines = text.splitlines()
+    if len(lines) < 3:
+        return f"{text[:head_budget]}\n[... {len(text) - head_budget - tail_budget} characters truncated ...]\n" \
+               f"{text[-tail_budget:]}"
+
+    head, used = [], 0
+    for line in lines:
+        if used + len(line) + 1 > head_budget:
+            break
+        head.append(line)
+        used += len(line) + 1
+    tail, used = [], 0
+    for line in reversed(lines[len(head):]):
+        if used + len(line) + 1 > tail_budget:
+            break
+        tail.insert(0, line)
+        used += len(line) + 1
+    omitted = len(lines) - len(head) - len(tail)
+    return "\n".join(head + [f"[... {omitted} lines truncated ...]"] + tail)
+
+
 def is_error(stderr: str) -> bool:
     if not stderr.strip():
         return False  # empty = no error
@@ -153,3 +195,27 @@ def sanitize_llm_json(raw: str) -> str:
     s = fix_unescaped_inner_quotes(s)
     s = remove_trailing_commas(s)
     return s
+
+
+def normalize_requirements(requirements: str) -> str:
+    # order, blank lines, comments and duplicates don't change what pip installs
+    lines = set()
+    for line in requirements.splitlines():
+        # pip only treats "#" as a comment at line start or after whitespace (URLs keep "#egg=")
+        line = re.sub(r"(^|\s)#.*$", "", line).strip()
+        if line:
+            lines.add(" ".join(line.split()))
+    return "\n".join(sorted(lines, key=str.lower))
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English and code, close enough for budgeting without a tokenizer
+    return (len(text) + 3) // 4
+
+
+def estimate_message_tokens(messages: list[dict]) -> int:
+    return sum(estimate_tokens(str(m.get("content", ""))) + 4 for m in messages)
+
+
+def count_message_tokens(message: dict) -> int:
+    return estimate_tokens(str(message.get("content", ""))) + 4
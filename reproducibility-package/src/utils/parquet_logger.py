@@ -0,0 +1,113 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+from src.utils.csv_logger import BufferedTraceLogger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional, only needed for logging.sink: parquet
+    pa = None
+    pq = None
+
+_INT_COLUMNS = {"question_id", "iteration", "exec_iteration", "review_iteration", "candidate", "exit_code",
+                "bench_repeats", "few_shot_tokens", "review_few_shot_tokens"}
+_FLOAT_SUFFIXES = ("_duration", "_median", "_stdev", "_mb")
+_TOKEN_FIELDS = ("input_tokens", "output_tokens", "total_tokens")
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("The parquet trace sink needs pyarrow: pip install pyarrow "
+                          "(or set logging.sink: csv in configs/config.yaml)")
+
+
+def column_type(name: str):
+    """Arrow type of a csv_schema column, inferred from its name."""
+    if name == "timestamp":
+        return pa.timestamp("us")
+    if name.endswith("token_usage"):
+        return pa.struct([(field, pa.int64()) for field in _TOKEN_FIELDS])
+    if name in _INT_COLUMNS:
+        return pa.int64()
+    if name in ("exec_time", "duration", "speedup", "bench_scale") or name.endswith(_FLOAT_SUFFIXES):
+        return pa.float64()
+    if name.endswith("_hit"):
+        return pa.bool_()
+    return pa.string()
+
+
+def _convert(value, arrow_type):
+    if value is None or value == "":
+        return None
+    if pa.types.is_timestamp(arrow_type):
+        return datetime.fromisoformat(value) if isinstance(value, str) else value
+    if pa.types.is_struct(arrow_type):
+        if isinstance(value, str):
+            value = json.loads(value)
+        return {field: int(value.get(field) or 0) for field in _TOKEN_FIELDS}
+    if pa.types.is_boolean(arrow_type):
+        return value if isinstance(value, bool) else str(value).lower() == "true"
+    if pa.types.is_int64(arrow_type):
+        return int(value)
+    if pa.types.is_float64(arrow_type):
+        return float(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class ParquetTraceLogger(BufferedTraceLogger):
+    """Writes schema-ordered rows to a zstd-compressed Parquet file, one row group per flush.
+
+    Same interface as CsvTraceLogger; a `.csv` filename is written as `.parquet`. Parquet files cannot
+    be appended to once closed, so a resumed run writes the next `<name>.partN.parquet` next to it.
+    """
+
+    def __init__(self, base_dir: Path, tag: str = None, category: str = None, schema_path: Path = "./",
+                 timestamp: str = None,
+                 filename: str = None, flush_rows: int = 20, flush_interval: float = 5.0,
+                 compression: str = "zstd"):
+        _require_pyarrow()
+        self.timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        if filename is None:
+            filename = f"execution_trace_{self.timestamp}.parquet"
+
+        self.compression = compression
+        self._writer = None
+        super().__init__(base_dir / "stack_overflow" / "logs" / Path(filename).with_suffix(".parquet").name,
+                         schema_path, flush_rows=flush_rows, flush_interval=flush_interval)
+        self.schema = pa.schema([(col, column_type(col)) for col in self.columns])
+
+    def _next_part_path(self) -> Path:
+        path, part = self.path, 0
+        while path.exists():
+            part += 1
+            path = self.path.with_name(f"{self.path.stem}.part{part}.parquet")
+        return path
+
+    def _write_rows(self, rows: list):
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._next_part_path(), self.schema, compression=self.compression)
+        columns = [
+            pa.array([_convert(row[i], field.type) for row in rows], type=field.type)
+            for i, field in enumerate(self.schema)
+        ]
+        self._writer.write_table(pa.Table.from_arrays(columns, schema=self.schema))
+
+    def _close_sink(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def load_trace_logs(run_dir: Path) -> dict:
+    """Reads every Parquet trace log of a run into one Arrow table per logger, keyed by file stem."""
+    _require_pyarrow()
+    logs_dir = Path(run_dir) / "stack_overflow" / "logs"
+    tables = {}
+    for path in sorted(logs_dir.glob("*.parquet")):
+        name = path.stem.split(".part")[0]
+        tables.setdefault(name, []).append(pq.read_table(path))
+    return {name: pa.concat_tables(parts) for name, parts in tables.items()}
@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+
+def _to_json(value):
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "item"):  # numpy scalars from the dataset rows
+        return value.item()
+    return str(value)
+
+
+class RunJournal:
+    """Append-only, fsync'ed JSONL journal of the stages each post has completed.
+
+    Every line is one completed stage (buggy_thoughts, buggy_code, patched_thoughts, patched_code,
+    post_done) with the artifact it produced, so an interrupted run can be resumed: finished posts are
+    skipped and unfinished ones restart after their last completed stage.
+    `loggers` are flushed before each entry so the trace logs are never behind the journal.
+    """
+
+    def __init__(self, path: Path, loggers: list = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.loggers = loggers or []
+        self._lock = threading.Lock()
+        self._stages = self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+        if self._file.tell() > 0 and not self.path.read_bytes().endswith(b"\n"):
+            self._file.write("\n")  # keep the next entry off a line cut short by the crash
+
+    def _load(self) -> dict:
+        stages = {}
+        if not self.path.exists():
+            return stages
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a line cut short by the crash, its stage simply runs again
+                    continue
+                stages.setdefault(str(entry["question_id"]), {})[entry["stage"]] = entry.get("artifact")
+        return stages
+
+    def checkpoint(self, question_id) -> dict:
+        """Artifacts of the stages `question_id` already completed, keyed by stage."""
+        with self._lock:
+            return dict(self._stages.get(str(question_id), {}))
+
+    def is_done(self, question_id) -> bool:
+        return "post_done" in self.checkpoint(question_id)
+
+    def record(self, question_id, stage: str, artifact=None):
+        for logger in self.loggers:
+            logger.flush()
+        entry = {"question_id": str(question_id), "stage": stage, "artifact": artifact}
+        line = json.dumps(entry, ensure_ascii=False, default=_to_json) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._stages.setdefault(str(question_id), {})[stage] = json.loads(line)["artifact"]
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,201 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    generator_llm TEXT NOT NULL,
+    judge_llm TEXT NOT NULL,
+    dataset TEXT,
+    started_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS posts (
+    question_id INTEGER PRIMARY KEY,
+    question TEXT,
+    answer TEXT
+);
+CREATE TABLE IF NOT EXISTS stage_events (
+    event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL REFERENCES runs(run_id),
+    question_id INTEGER REFERENCES posts(question_id),
+    stage TEXT NOT NULL,
+    iteration INTEGER,
+    exec_iteration INTEGER,
+    review_iteration INTEGER,
+    label TEXT,
+    rationale TEXT,
+    exit_code INTEGER,
+    error TEXT,
+    generation_duration REAL,
+    evaluation_duration REAL,
+    exec_time REAL,
+    payload TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS token_usage (
+    event_id INTEGER NOT NULL REFERENCES stage_events(event_id),
+    kind TEXT NOT NULL,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    total_tokens INTEGER,
+    PRIMARY KEY (event_id, kind)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_models ON runs(generator_llm, judge_llm);
+CREATE INDEX IF NOT EXISTS idx_events_run_question ON stage_events(run_id, question_id, stage);
+CREATE INDEX IF NOT EXISTS idx_events_question_stage ON stage_events(question_id, stage);
+"""
+
+_INT_FIELDS = ("iteration", "exec_iteration", "review_iteration", "exit_code")
+_REAL_FIELDS = ("generation_duration", "evaluation_duration", "exec_time")
+
+
+def _as_number(value, cast):
+    if value is None or value == "":
+        return None
+    return cast(value)
+
+
+class RunStore:
+    """SQLite store (WAL mode) for the traces of many runs.
+
+    Posts are stored once, every logged row becomes a stage event of a run, and token usage gets its own
+    table so models can be compared with plain SQL. Each thread uses its own connection; concurrent
+    writers wait on the busy timeout instead of failing.
+    """
+
+    def __init__(self, db_path: Path, busy_timeout: float = 30.0):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def start_run(self, run_id: str, generator_llm: str, judge_llm: str, dataset: str = None):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, generator_llm, judge_llm, dataset, started_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (run_id, generator_llm, judge_llm, dataset, datetime.now().isoformat()),
+            )
+
+    def add_post(self, question_id, question: str = None, answer: str = None):
+        with self._connection() as conn:
+            self._upsert_post(conn, question_id, question, answer)
+
+    @staticmethod
+    def _upsert_post(conn, question_id, question, answer):
+        conn.execute(
+            "INSERT INTO posts (question_id, question, answer) VALUES (?, ?, ?) "
+            "ON CONFLICT(question_id) DO UPDATE SET "
+            "question = COALESCE(excluded.question, question), answer = COALESCE(excluded.answer, answer)",
+            (int(question_id), question, answer),
+        )
+
+    def record(self, run_id: str, stage: str, **fields):
+        """Stores one logged row; unknown fields (code, stdout, requirements, ...) go to the JSON payload."""
+        fields = {key: value for key, value in fields.items() if value is not None}
+        question_id = _as_number(fields.pop("question_id", None), int)
+        question = fields.pop("question", None)
+        answer = fields.pop("answer", None)
+        fields.pop("timestamp", None)
+
+        columns = {col: _as_number(fields.pop(col, None), int) for col in _INT_FIELDS}
+        columns.update({col: _as_number(fields.pop(col, None), float) for col in _REAL_FIELDS})
+        columns["error"] = fields.pop("error", None) or None
+        for key in list(fields):
+            if key.endswith("_label"):
+                columns["label"] = fields.pop(key)
+            elif key.endswith("_rational") or key.endswith("_rationale"):
+                columns["rationale"] = fields.pop(key)
+        # generation_token_usage -> "generation"; the judge logs only have a plain token_usage.
+        # the agents hand usage over as a JSON string
+        usage = {}
+        for key in [key for key in fields if key.endswith("token_usage")]:
+            tokens = fields.pop(key)
+            if isinstance(tokens, str):
+                tokens = json.loads(tokens) if tokens else None
+            usage[key[:-len("token_usage")].rstrip("_") or "judge"] = tokens
+
+        with self._connection() as conn:
+            if question_id is not None:
+                self._upsert_post(conn, question_id, question, answer)
+            cursor = conn.execute(
+                f"INSERT INTO stage_events (run_id, question_id, stage, {', '.join(columns)}, payload, created_at) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(columns))}, ?, ?)",
+                (run_id, question_id, stage, *columns.values(),
+                 json.dumps(fields, ensure_ascii=False, default=str), datetime.now().isoformat()),
+            )
+            conn.executemany(
+                "INSERT INTO token_usage (event_id, kind, input_tokens, output_tokens, total_tokens) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, kind, tokens.get("input_tokens"), tokens.get("output_tokens"),
+                  tokens.get("total_tokens"))
+                 for kind, tokens in usage.items() if isinstance(tokens, dict)],
+            )
+
+    def query(self, sql: str, params=()) -> list:
+        return self._connection().execute(sql, params).fetchall()
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class RunStoreLogger:
+    """Trace-logger interface over a RunStore, so a pipeline stage can log into it like into a CSV."""
+
+    def __init__(self, store: RunStore, run_id: str, stage: str):
+        self.store = store
+        self.run_id = run_id
+        self.stage = stage
+
+    def append_row(self, **kwargs):
+        self.store.record(self.run_id, self.stage, **kwargs)
+
+    def flush(self, only_if_due: bool = False):
+        pass
+
+    def close(self):
+        pass
+
+
+class TeeTraceLogger:
+    """Forwards every row to several trace loggers."""
+
+    def __init__(self, *loggers):
+        self.loggers = loggers
+
+    def append_row(self, **kwargs):
+        for logger in self.loggers:
+            logger.append_row(**kwargs)
+
+    def flush(self, only_if_due: bool = False):
+        for logger in self.loggers:
+            logger.flush(only_if_due=only_if_due)
+
+    def close(self):
+        for logger in self.loggers:
+            logger.close()
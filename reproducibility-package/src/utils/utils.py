@@ -1,6 +1,8 @@
 class Utils:
     @staticmethod
     def remove_duplicate_example(examples, text):
+        if hasattr(examples, "filter"):  # a FewShotIndex from the registry does this with a cached lookup
+            return examples.filter(text)
         filtered = []
         i = 0
         while i < len(examples):
@@ -0,0 +1,48 @@
+import json
+import subprocess
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+from src.utils.helper import normalize_requirements
+
+# copied next to the script into the sandbox, see its docstring
+BENCH_RUNNER = Path(__file__).with_name("bench_runner.py")
+
+
+class CodeValidator(ABC):
+    @abstractmethod
+    def validate(self, script: str, requirements: str) -> dict:
+        """Runs `script` with `requirements` installed and returns its stdout, stderr and returncode.
+
+        Raises RuntimeError when the environment itself (image, virtualenv) cannot be built.
+        """
+        pass
+
+    def environment_key(self, requirements: str) -> str:
+        """Identifies everything besides the script that decides how it runs (backend, Python, packages)."""
+        return "\n\0".join([type(self).__name__, normalize_requirements(requirements).lower()])
+
+    def benchmark(self, script: str, requirements: str, repeats: int = 5, warmup: int = 1, cpus: str = None,
+                  scale: float = 1, timeout: float = 300) -> dict:
+        """Times `script` in `repeats` fresh processes (after `warmup` untimed ones), pinned to `cpus`.
+
+        Returns the runner's result: runs, returncode, times, median, min, stdev (seconds) and
+        peak_rss_mb. Raises RuntimeError when the environment cannot be built or the runner fails.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot benchmark scripts")
+
+
+def bench_env(repeats: int, warmup: int, cpus: str, scale: float, timeout: float) -> dict:
+    env = {"BENCH_REPEATS": str(repeats), "BENCH_WARMUP": str(warmup), "BENCH_SCALE": str(scale),
+           "BENCH_TIMEOUT": str(timeout)}
+    if cpus is not None:
+        env["BENCH_CPUS"] = str(cpus)
+    return env
+
+
+def read_bench_result(result: subprocess.CompletedProcess) -> dict:
+    lines = result.stdout.strip().splitlines()
+    try:
+        return json.loads(lines[-1])
+    except (IndexError, ValueError):
+        raise RuntimeError(f"Benchmark runner failed (exit code {result.returncode}):\n{result.stderr[-2000:]}")
@@ -0,0 +1,102 @@
+"""Times a script in fresh child processes and prints the results as one JSON line.
+
+Copied into the sandbox next to the script and run with the sandbox's interpreter, so it must stay
+standard-library only and Python 3.8 compatible. Settings come from the environment:
+BENCH_REPEATS, BENCH_WARMUP, BENCH_TIMEOUT (seconds per run), BENCH_CPUS ("0,1" or "0-3,6", as for
+docker --cpuset-cpus) and BENCH_SCALE, which is passed on to the script for the ones that size their
+mock data by it.
+"""
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# the child times only the script itself, not the interpreter start-up
+_CHILD = (
+    "import os, runpy, sys, time\n"
+    "sys.argv = sys.argv[1:]\n"
+    "start = time.perf_counter()\n"
+    "code = 0\n"
+    "try:\n"
+    "    runpy.run_path(sys.argv[0], run_name='__main__')\n"
+    "except SystemExit as e:\n"
+    "    code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)\n"
+    "with open(os.environ['BENCH_RESULT'], 'w') as f:\n"
+    "    f.write(repr(time.perf_counter() - start))\n"
+    "sys.exit(code)\n"
+)
+
+
+def _run_once(script, timeout):
+    """(seconds, peak RSS in MB, returncode) of one run in a fresh process."""
+    fd, result_path = tempfile.mkstemp(suffix=".time")
+    os.close(fd)
+    env = dict(os.environ, BENCH_RESULT=result_path)
+    devnull = [(os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+               (os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY, 0)]
+    pid = os.posix_spawn(sys.executable, [sys.executable, "-c", _CHILD, script], env, file_actions=devnull)
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            # wait4 reports the resource usage of this child alone, unlike getrusage(RUSAGE_CHILDREN)
+            waited, status, usage = os.wait4(pid, os.WNOHANG)
+            if waited:
+                break
+            if time.monotonic() > deadline:
+                os.kill(pid, 9)
+                os.wait4(pid, 0)
+                return None, None, -1
+            time.sleep(0.005)
+        returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+        with open(result_path) as f:
+            elapsed = float(f.read() or "nan")
+        return elapsed, usage.ru_maxrss / 1024, returncode
+    except (OSError, ValueError):
+        return None, None, -1
+    finally:
+        os.unlink(result_path)
+
+
+def _parse_cpus(spec):
+    cpus = set()
+    for part in spec.split(","):
+        first, _, last = part.strip().partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def main():
+    script = os.path.abspath(sys.argv[1])
+    repeats = int(os.environ.get("BENCH_REPEATS", "5"))
+    warmup = int(os.environ.get("BENCH_WARMUP", "1"))
+    timeout = float(os.environ.get("BENCH_TIMEOUT", "300"))
+    cpus = os.environ.get("BENCH_CPUS")
+    if cpus:
+        os.sched_setaffinity(0, _parse_cpus(cpus))  # inherited by every run
+
+    times, peak_rss, returncode = [], [], 0
+    for run in range(warmup + repeats):
+        elapsed, rss, code = _run_once(script, timeout)
+        if code != 0 or elapsed is None:
+            returncode = code
+            break
+        if run >= warmup:
+            times.append(elapsed)
+            peak_rss.append(rss)
+
+    print(json.dumps({
+        "runs": len(times),
+        "returncode": returncode,
+        "times": [round(t, 6) for t in times],
+        "median": statistics.median(times) if times else None,
+        "min": min(times) if times else None,
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "peak_rss_mb": round(max(peak_rss), 1) if peak_rss else None,
+        "cpus": sorted(os.sched_getaffinity(0)),
+    }))
+
+
+if __name__ == "__main__":
+    main()
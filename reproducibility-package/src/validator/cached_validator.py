@@ -0,0 +1,85 @@
+import hashlib
+import threading
+from collections import defaultdict
+
+from src.utils.disk_cache import DiskCache
+from src.validator.base import CodeValidator
+
+# -1: timeout, 125-127: docker could not run the script, 137: killed (usually OOM); these depend on the
+# machine's load rather than on the script, so they are run again next time
+_UNCACHED_RETURNCODES = {-1, 125, 126, 127, 137}
+
+
+def normalize_script(script: str) -> str:
+    # line endings and trailing whitespace don't change what Python runs; line numbers (and so the
+    # tracebacks in stderr) stay the same
+    lines = [line.rstrip() for line in script.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+class CachedValidator(CodeValidator):
+    """Serves repeated executions of a script from a persistent cache of its stdout, stderr and returncode.
+
+    Keyed by the normalized script and the wrapped backend's environment key (backend, Python version,
+    normalized requirements), so refinement rounds that resubmit the same script and reruns of a
+    dataset skip the sandbox. Results carry `cached`; environment failures (RuntimeError) are never
+    cached and neither are timeouts and killed runs.
+    """
+
+    # one lock per key, identical scripts submitted at once (e.g. speculative candidates) run a single time
+    _key_locks = defaultdict(threading.Lock)
+
+    def __init__(self, validator: CodeValidator, cache: DiskCache):
+        self.validator = validator
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # image_cache, container_pool, ... of the wrapped backend
+        if name == "validator":
+            raise AttributeError(name)
+        return getattr(self.validator, name)
+
+    def environment_key(self, requirements: str) -> str:
+        return self.validator.environment_key(requirements)
+
+    def benchmark(self, script: str, requirements: str, **kwargs) -> dict:
+        # timings depend on the machine and its load, they are never cached
+        return self.validator.benchmark(script, requirements, **kwargs)
+
+    def cache_key(self, script: str, requirements: str) -> str:
+        return hashlib.sha256("\n\0".join([
+            self.environment_key(requirements or ""),
+            normalize_script(script or ""),
+        ]).encode("utf-8")).hexdigest()
+
+    def validate(self, script: str, requirements: str) -> dict:
+        key = self.cache_key(script, requirements)
+        with self._key_locks[key]:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count(hit=True)
+                print(f"[INFO] Reusing cached execution result ({key[:12]})")
+                return {**cached, "cached": True}
+
+            self._count(hit=False)
+            result = self.validator.validate(script=script, requirements=requirements)
+            if result.get("returncode") not in _UNCACHED_RETURNCODES:
+                self.cache.set(key, {name: result.get(name) for name in ("stdout", "stderr", "returncode")})
+        return {**result, "cached": False}
+
+    def hit_rate(self) -> float:
+        with self._stats_lock:
+            calls = self.hits + self.misses
+            return self.hits / calls if calls else 0.0
+
+    def _count(self, hit: bool):
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
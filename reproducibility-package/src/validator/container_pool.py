@@ -0,0 +1,199 @@
+import atexit
+import os
+import socket
+import subprocess
+import threading
+import uuid
+from collections import defaultdict
+
+POOL_LABEL = "stackcodegen.pool"
+# unprivileged user every script runs as: it can write only to its run directory and the shared temp
+# directories, which are cleaned after the run together with any process it left behind
+RUN_UID = 10001
+# run inside the container with `python -c`, python being the one tool every sandbox image has
+_AS_RUN_USER = (f"import os, sys; os.setgroups([]); os.setgid({RUN_UID}); os.setuid({RUN_UID}); "
+                f"os.execvp(sys.argv[1], sys.argv[1:])")
+# kill(-1) as the run user reaches every process of that user but the caller
+_KILL_RUN_USER = "import os\ntry:\n    os.kill(-1, 9)\nexcept OSError:\n    pass\n"
+
+
+class PooledContainer:
+    def __init__(self, container_id: str, tag: str):
+        self.container_id = container_id
+        self.tag = tag
+        self.uses = 0
+
+
+class ContainerPool:
+    """Long-lived sandbox containers, kept warm per image and reused through `docker exec`.
+
+    Every script runs as an unprivileged user in its own scratch directory, which is also its HOME and
+    TMPDIR. Afterwards the container is reset: the user's leftover processes are killed and its files in
+    /tmp, /var/tmp and /dev/shm are deleted, so no state reaches the next script. A container is
+    replaced after `max_uses` scripts, or right away when a script times out or the container dies.
+    Containers are labelled with their owning process, so the ones a crashed run left behind are
+    removed when the next pool starts.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, containers_per_image: int = 2, max_containers: int = 8, max_uses: int = 20):
+        self.containers_per_image = containers_per_image
+        self.max_containers = max_containers
+        self.max_uses = max_uses
+        self._idle = defaultdict(list)
+        self._total = 0
+        # every started container, idle or checked out, so shutdown can remove all of them
+        self._containers = {}
+        self._condition = threading.Condition()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._remove_orphans()
+        atexit.register(self.shutdown)
+
+    @classmethod
+    def get_shared(cls, **kwargs) -> "ContainerPool":
+        # all validators of a process draw from one pool, so the container bound holds globally
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(**kwargs)
+            return cls._shared
+
+    def run_script(self, tag: str, script: str, timeout: int = 30) -> subprocess.CompletedProcess:
+        container = self._acquire(tag)
+        run_dir = f"/runs/{uuid.uuid4().hex}"
+        # write the script from stdin, run it as the run user from a fresh directory, then reset the
+        # container, all in a single exec
+        command = (f"mkdir -p {run_dir}/tmp && chown -R {RUN_UID}:{RUN_UID} {run_dir} && cd {run_dir} && "
+                   f"cat > script.py && HOME={run_dir} TMPDIR={run_dir}/tmp "
+                   f"python -c \"$AS_RUN_USER\" python script.py; rc=$?; "
+                   f"python -c \"$AS_RUN_USER\" python -c \"$KILL_RUN_USER\" >/dev/null 2>&1; "
+                   f"cd / && rm -rf {run_dir}; "
+                   f"find /tmp /var/tmp /dev/shm -xdev -user {RUN_UID} -delete >/dev/null 2>&1; exit $rc")
+        healthy = False
+        try:
+            result = subprocess.run(
+                ["docker", "exec", "-i", "-e", f"AS_RUN_USER={_AS_RUN_USER}", "-e", f"KILL_RUN_USER={_KILL_RUN_USER}",
+                 container.container_id, "sh", "-c", command],
+                input=script,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=timeout,
+            )
+            # 125-127: docker could not exec, 137: killed (usually OOM), the container can't be trusted anymore
+            healthy = result.returncode not in (125, 126, 127, 137)
+            return result
+        finally:
+            self._release(container, healthy)
+
+    def discard(self, tag: str):
+        """Stops the idle containers of an image, e.g. before the image is evicted."""
+        with self._condition:
+            containers = self._idle.pop(tag, [])
+            self._total -= len(containers)
+            self._condition.notify_all()
+        for container in containers:
+            self._stop(container)
+
+    def shutdown(self):
+        # checked out containers too: at exit (Ctrl-C included) nothing will return them
+        with self._condition:
+            containers = list(self._containers.values())
+            self._idle.clear()
+            self._total = 0
+        for container in containers:
+            self._stop(container)
+
+    def _remove_orphans(self):
+        """Removes pool containers whose owning process on this host is gone (crash, kill -9)."""
+        try:
+            listing = subprocess.run(
+                ["docker", "ps", "-a", "--filter", f"label={POOL_LABEL}=1",
+                 "--format", f'{{{{.ID}}}} {{{{.Label "{POOL_LABEL}.owner"}}}}'],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        except OSError:
+            return
+        host = socket.gethostname()
+        orphans = []
+        for line in listing.stdout.splitlines():
+            container_id, _, owner = line.partition(" ")
+            owner_host, _, pid = owner.rpartition(":")
+            # containers of older runs carry no owner; those of other hosts (shared daemon) are left alone
+            if not owner or owner_host == host and not self._alive(pid):
+                orphans.append(container_id)
+        if orphans:
+            subprocess.run(["docker", "rm", "-f", *orphans], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            print(f"[INFO] Removed {len(orphans)} sandbox containers left behind by earlier runs")
+
+    @staticmethod
+    def _alive(pid: str) -> bool:
+        try:
+            os.kill(int(pid), 0)
+        except (ValueError, ProcessLookupError):
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _acquire(self, tag: str) -> PooledContainer:
+        while True:
+            victim = None
+            with self._condition:
+                if self._idle[tag]:
+                    return self._idle[tag].pop()
+                if self._total < self.max_containers:
+                    self._total += 1
+                    break
+                # pool is full: make room by recycling an idle container of another image, or wait for one
+                other_tags = [t for t, idle in self._idle.items() if idle and t != tag]
+                if other_tags:
+                    victim = self._idle[other_tags[0]].pop()
+                    self._total -= 1
+                else:
+                    self._condition.wait()
+            if victim:
+                self._stop(victim)
+
+        try:
+            return self._start(tag)
+        except Exception:
+            with self._condition:
+                self._total -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, container: PooledContainer, healthy: bool):
+        container.uses += 1
+        with self._condition:
+            idle = self._idle[container.tag]
+            if healthy and container.uses < self.max_uses and len(idle) < self.containers_per_image:
+                idle.append(container)
+                self._condition.notify()
+                return
+            self._total -= 1
+            self._condition.notify()
+        self._stop(container)
+
+    def _start(self, tag: str) -> PooledContainer:
+        print(f"[INFO] Starting warm sandbox container for image: {tag}")
+        result = subprocess.run(
+            # --init reaps the processes killed after each script, `sleep` as PID 1 would leave them as zombies
+            ["docker", "run", "-d", "--rm", "--init", "--label", f"{POOL_LABEL}=1",
+             "--label", f"{POOL_LABEL}.owner={self.owner}", tag, "sleep", "infinity"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"[DOCKER RUN FAILED]\nSTDERR:\n{result.stderr}")
+        container = PooledContainer(result.stdout.strip(), tag)
+        with self._condition:
+            self._containers[container.container_id] = container
+        return container
+
+    def _stop(self, container: PooledContainer):
+        with self._condition:
+            self._containers.pop(container.container_id, None)
+        subprocess.run(["docker", "rm", "-f", container.container_id],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
@@ -1,33 +1,123 @@
+import hashlib
+import shutil
 import subprocess
 import tempfile
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
 from pathlib import Path
-import uuid
 
+from src.utils.helper import normalize_requirements
+from src.validator.base import BENCH_RUNNER, CodeValidator, bench_env, read_bench_result
+from src.validator.container_pool import ContainerPool
+from src.validator.image_cache import ImageCache
 
-class DockerValidator:
-    def __init__(self, docker_template_path: Path, python_version: str = "3.8", pandas_version: str = "1.1.5"):
+
+class DockerValidator(CodeValidator):
+    # one lock per image so concurrent posts with the same requirements wait for a single build
+    _build_locks = defaultdict(threading.Lock)
+
+    def __init__(self, docker_template_path: Path, python_version: str = "3.8", pandas_version: str = "1.1.5",
+                 cache_dir: Path = None, max_cached_images: int = 20, max_cache_size_gb: float = None,
+                 container_pool: ContainerPool = None):
         self.docker_template_path = docker_template_path
         self.python_version = python_version
-        self.tag = f"py{self.python_version.replace('.', '_')}_{uuid.uuid4().hex[:6]}"
+        cache_dir = Path(cache_dir) if cache_dir else Path(docker_template_path).parent / ".cache"
+        self.image_cache = ImageCache.get_shared(cache_dir / "sandbox_images.json", max_images=max_cached_images,
+                                                 max_size_gb=max_cache_size_gb)
+        # warm containers to exec scripts in; without a pool every script gets a cold `docker run`
+        self.container_pool = container_pool
 
     def _prepare_dockerfile(self) -> str:
         template = self.docker_template_path.read_text()
         return template.replace("__PY_VERSION__", self.python_version)
 
+    def image_tag(self, requirements: str) -> str:
+        # content-addressed: the same python version + dependency set always maps to the same image
+        key = hashlib.sha256("\n\0".join([
+            self.python_version,
+            self._prepare_dockerfile(),
+            normalize_requirements(requirements).lower(),
+        ]).encode("utf-8")).hexdigest()
+        return f"stackcodegen-sandbox:{key[:16]}"
+
+    def environment_key(self, requirements: str) -> str:
+        return self.image_tag(requirements)
+
     def validate(self, script: str, requirements: str) -> dict:
+        with self._image(requirements) as tag:
+            if self.container_pool is not None:
+                result = self._exec_script(tag, script)
+                return {
+                    "stdout": result.stdout,
+                    "stderr": result.stderr,
+                    "returncode": result.returncode
+                }
+
+            with tempfile.TemporaryDirectory() as tmpdir:
+                script_path = Path(tmpdir) / "script.py"
+                script_path.write_text(script)
+
+                result = self._run_script(tag, script_path)
+                return {
+                    "stdout": result.stdout,
+                    "stderr": result.stderr,
+                    "returncode": result.returncode
+                }
+
+    def benchmark(self, script: str, requirements: str, repeats: int = 5, warmup: int = 1, cpus: str = None,
+                  scale: float = 1, timeout: float = 300) -> dict:
+        # a dedicated cold container, not a pooled one: nothing else runs on its (pinned) CPUs
+        with self._image(requirements) as tag, tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "script.py").write_text(script)
+            shutil.copy(BENCH_RUNNER, Path(tmpdir) / "bench_runner.py")
+            command = ["docker", "run", "--rm", "-v", f"{Path(tmpdir).resolve()}:/bench:ro"]
+            if cpus is not None:
+                command += ["--cpuset-cpus", str(cpus)]
+            for name, value in bench_env(repeats, warmup, cpus, scale, timeout).items():
+                command += ["-e", f"{name}={value}"]
+            command += [tag, "python", "/bench/bench_runner.py", "/bench/script.py"]
+
+            print(f"[INFO] Benchmarking script in Docker ({repeats} runs, CPUs {cpus or 'unpinned'})...")
+            try:
+                result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                        timeout=timeout * (repeats + warmup) + 60)
+            except subprocess.TimeoutExpired as e:
+                raise RuntimeError(f"[TIMEOUT] Benchmark exceeded {e.timeout} seconds.") from e
+            return read_bench_result(result)
+
+    @contextmanager
+    def _image(self, requirements: str):
+        """Builds or reuses the image for `requirements`; it cannot be evicted until the block exits."""
+        tag = self.image_tag(requirements)
+        # marked in use before the existence check, so an eviction either finished before it (and the
+        # image is rebuilt) or skips it
+        with self.image_cache.in_use(tag):
+            with self._build_locks[tag]:
+                if self.image_cache.image_exists(tag):
+                    print(f"[INFO] Reusing cached Docker image: {tag}")
+                    self.image_cache.touch(tag)
+                else:
+                    self.image_cache.forget(tag)
+                    self._build_image(tag, requirements)
+                    self.image_cache.touch(tag, size=self.image_cache.image_size(tag))
+            self.image_cache.evict(keep=tag,
+                                   before_remove=self.container_pool.discard if self.container_pool else None)
+            yield tag
+
+    def _build_image(self, tag: str, requirements: str):
         with tempfile.TemporaryDirectory() as tmpdir:
             tmp_path = Path(tmpdir)
 
-            # Write files
-            (tmp_path / "script.py").write_text(script)
+            # Only the dependency layer is baked into the image, the script is mounted at run time
             (tmp_path / "requirements.txt").write_text(requirements)
             (tmp_path / "Dockerfile").write_text(self._prepare_dockerfile())
 
             # Build Docker image
-            print(f"[INFO] Building Docker image with tag: {self.tag}...")
+            print(f"[INFO] Building Docker image with tag: {tag}...")
             try:
                 subprocess.run(
-                    ["docker", "build", "--no-cache", "--progress=plain", "-t", self.tag, str(tmp_path)],
+                    ["docker", "build", "--no-cache", "--progress=plain", "-t", tag, str(tmp_path)],
                     check=True,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
@@ -39,18 +129,27 @@ class DockerValidator:
                 print(error_msg)
                 raise RuntimeError(error_msg) from e
 
-            result = self._run_script("script.py")
-            return {
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "returncode": result.returncode
-            }
+    def _exec_script(self, tag: str, script: str, script_name: str = "script.py") -> subprocess.CompletedProcess:
+        print(f"[INFO] Running script: {script_name} in a warm Docker container...")
+        try:
+            return self.container_pool.run_script(tag, script, timeout=30)
+        except subprocess.TimeoutExpired as e:
+            error_msg = f"[TIMEOUT] Script '{script_name}' exceeded {e.timeout} seconds."
+            print(error_msg)
+            return subprocess.CompletedProcess(
+                args=e.cmd,
+                returncode=-1,
+                stdout="",
+                stderr=error_msg
+            )
 
-    def _run_script(self, script_name: str) -> subprocess.CompletedProcess:
+    def _run_script(self, tag: str, script_path: Path) -> subprocess.CompletedProcess:
+        script_name = script_path.name
         print(f"[INFO] Running script: {script_name} in Docker...")
         try:
             result = subprocess.run(
-                ["docker", "run", "--rm", self.tag, "python", script_name],
+                ["docker", "run", "--rm", "-v", f"{script_path.resolve()}:/app/{script_name}:ro",
+                 tag, "python", script_name],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 text=True,
@@ -0,0 +1,76 @@
+from src.config.loader import ConfigLoader
+from src.utils.disk_cache import DiskCache
+from src.validator.base import CodeValidator
+from src.validator.cached_validator import CachedValidator
+from src.validator.preflight import Preflight, PreflightValidator
+
+
+class ValidatorFactory:
+    def __init__(self, config: ConfigLoader):
+        self.config = config
+        self.sandbox_config = config.get("sandbox")
+
+    def get_validator(self) -> CodeValidator:
+        backend = self.sandbox_config.backend
+        cache_dir = self.config.root_dir / self.sandbox_config.cache_dir
+        python_version = str(self.sandbox_config.python_version)
+
+        if backend == "docker":
+            from src.validator.container_pool import ContainerPool
+            from src.validator.docker_validator import DockerValidator
+
+            pool_config = self.sandbox_config.container_pool
+            container_pool = ContainerPool.get_shared(
+                containers_per_image=pool_config.containers_per_image,
+                max_containers=pool_config.max_containers,
+                max_uses=pool_config.max_uses,
+            ) if pool_config.enabled else None
+            validator = DockerValidator(
+                self.config.root_dir / "src/utils/docker_template/Dockerfile.template",
+                python_version=python_version,
+                cache_dir=cache_dir,
+                max_cached_images=self.sandbox_config.image_cache.max_images,
+                max_cache_size_gb=self.sandbox_config.image_cache.max_size_gb,
+                container_pool=container_pool,
+            )
+        elif backend == "local":
+            from src.validator.local_validator import LocalValidator
+
+            local_config = self.sandbox_config.local
+            validator = LocalValidator(
+                cache_dir=cache_dir,
+                python_executable=local_config.python_executable,
+                python_version=python_version,
+                max_venvs=local_config.max_venvs,
+                timeout=local_config.timeout,
+                cpu_seconds=local_config.cpu_seconds,
+                memory_mb=local_config.memory_mb,
+                allow_network=local_config.allow_network,
+            )
+        else:
+            raise ValueError(f"Unsupported sandbox backend: {backend}")
+        # checks first, then cached results, then the sandbox itself
+        return self._with_preflight(self._with_result_cache(validator, cache_dir), python_version)
+
+    def _with_result_cache(self, validator: CodeValidator, cache_dir) -> CodeValidator:
+        cache_config = self.sandbox_config.get("result_cache")
+        if not cache_config or not cache_config.get("enabled", False):
+            return validator
+        ttl_hours = cache_config.get("ttl_hours")
+        cache = DiskCache(cache_dir / "exec_results", max_size_mb=cache_config.get("max_size_mb"),
+                          ttl_seconds=ttl_hours * 3600 if ttl_hours else None)
+        return CachedValidator(validator, cache)
+
+    def _with_preflight(self, validator: CodeValidator, python_version: str) -> CodeValidator:
+        preflight_config = self.sandbox_config.get("preflight")
+        if not preflight_config or not preflight_config.get("enabled", False):
+            return validator
+        preflight = Preflight(python_version, require_pins=preflight_config.get("require_pins", True))
+        return PreflightValidator(validator, preflight)
+
+
+def validator_layers(validator: CodeValidator):
+    """The validator and the ones it wraps, outermost first."""
+    while validator is not None:
+        yield validator
+        validator = vars(validator).get("validator")
@@ -0,0 +1,129 @@
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class ImageCache:
+    """LRU index of the sandbox images built by DockerValidator.
+
+    The index lives on disk so images are reused across runs; docker itself stays the source of
+    truth for whether an image still exists. Images held through `in_use` are never evicted.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, index_path: Path, max_images: int = 20, max_size_gb: float = None):
+        self.index_path = Path(index_path)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_images = max_images
+        self.max_size_bytes = int(max_size_gb * 1024 ** 3) if max_size_gb else None
+        self._lock = threading.Lock()
+        self._in_use = Counter()
+
+    @classmethod
+    def get_shared(cls, index_path: Path, **kwargs) -> "ImageCache":
+        # the buggy and patched validators share one index file, so they must share its lock as well
+        key = Path(index_path).resolve()
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(index_path, **kwargs)
+            return cls._shared[key]
+
+    def _load(self) -> dict:
+        if not self.index_path.exists():
+            return {}
+        try:
+            return json.loads(self.index_path.read_text())
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save(self, index: dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_path.parent, prefix=self.index_path.stem, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(json.dumps(index, indent=2))
+            os.replace(tmp_path, self.index_path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    @contextmanager
+    def in_use(self, tag: str):
+        """Keeps `tag` from being evicted until the block exits (build or check, then the run)."""
+        with self._lock:
+            self._in_use[tag] += 1
+        try:
+            yield tag
+        finally:
+            with self._lock:
+                self._in_use[tag] -= 1
+                if not self._in_use[tag]:
+                    del self._in_use[tag]
+
+    @staticmethod
+    def image_exists(tag: str) -> bool:
+        result = subprocess.run(["docker", "image", "inspect", tag],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return result.returncode == 0
+
+    @staticmethod
+    def image_size(tag: str) -> int:
+        result = subprocess.run(["docker", "image", "inspect", "--format", "{{.Size}}", tag],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            return int(result.stdout.strip())
+        except ValueError:
+            return 0
+
+    def touch(self, tag: str, size: int = None):
+        with self._lock:
+            index = self._load()
+            entry = index.get(tag, {})
+            entry["last_used"] = time.time()
+            if size is not None:
+                entry["size"] = size
+            index[tag] = entry
+            self._save(index)
+
+    def forget(self, tag: str):
+        with self._lock:
+            index = self._load()
+            if index.pop(tag, None) is not None:
+                self._save(index)
+
+    def evict(self, keep: str = None, before_remove=None) -> list[str]:
+        """Removes least recently used images until the count and size bounds hold again."""
+        with self._lock:
+            index = self._load()
+            by_age = sorted((tag for tag in index if tag != keep and tag not in self._in_use),
+                            key=lambda t: index[t].get("last_used", 0))
+            total_size = sum(entry.get("size", 0) for entry in index.values())
+
+            evicted = []
+            for tag in by_age:
+                too_many = self.max_images and len(index) > self.max_images
+                too_large = self.max_size_bytes and total_size > self.max_size_bytes
+                if not (too_many or too_large):
+                    break
+                if before_remove is not None:
+                    # e.g. stop the warm containers that would otherwise keep the image alive
+                    before_remove(tag)
+                result = subprocess.run(["docker", "rmi", tag], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                        text=True)
+                if result.returncode != 0 and "No such image" not in result.stderr:
+                    # still used by a running container, try again on the next eviction
+                    continue
+                total_size -= index.pop(tag).get("size", 0)
+                evicted.append(tag)
+
+            if evicted:
+                self._save(index)
+                print(f"[INFO] Evicted sandbox images: {', '.join(evicted)}")
+            return evicted
@@ -0,0 +1,239 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.utils.helper import normalize_requirements
+from src.validator.base import BENCH_RUNNER, CodeValidator, bench_env, read_bench_result
+
+# sets the limits and execs the script's interpreter; a preexec_fn could deadlock in the forked child of
+# this heavily threaded process
+_LIMIT_SHIM = (
+    "import os, resource, sys\n"
+    "cpu, memory = int(sys.argv[1]), int(sys.argv[2])\n"
+    "resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))\n"
+    "resource.setrlimit(resource.RLIMIT_AS, (memory, memory))\n"
+    "os.execv(sys.argv[3], sys.argv[3:])\n"
+)
+
+
+class LocalValidator(CodeValidator):
+    """Docker-free backend: one cached virtualenv per dependency set, scripts run in a rlimited subprocess."""
+
+    _build_locks = defaultdict(threading.Lock)
+    # venv path -> scripts running in it (or about to), the venvs eviction must leave alone
+    _in_use = Counter()
+    _in_use_lock = threading.Lock()
+
+    def __init__(self, cache_dir: Path, python_executable: str = None, python_version: str = "3.8",
+                 max_venvs: int = 20, timeout: int = 30, cpu_seconds: int = 30, memory_mb: int = 4096,
+                 allow_network: bool = False):
+        self.python_executable, self.interpreter_version = self._resolve_interpreter(python_executable,
+                                                                                   python_version)
+        self.venv_dir = Path(cache_dir) / "venvs"
+        self.venv_dir.mkdir(parents=True, exist_ok=True)
+        self.max_venvs = max_venvs
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.allow_network = allow_network
+
+        if not self.interpreter_version.startswith(python_version):
+            print(f"[WARN] Local sandbox uses Python {self.interpreter_version.split()[0]}, "
+                  f"the Docker sandbox would use {python_version}")
+        self._network_prefix = [] if allow_network else self._no_network_prefix()
+
+    @staticmethod
+    def _resolve_interpreter(python_executable: str, python_version: str):
+        # an explicitly configured interpreter must work, the automatic choices may fall through (e.g. pyenv shims)
+        candidates = [python_executable] if python_executable else [
+            shutil.which(f"python{python_version}"), sys.executable]
+        for candidate in filter(None, candidates):
+            probe = subprocess.run([candidate, "-c", "import sys; print(sys.version)"],
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            if probe.returncode == 0:
+                return candidate, probe.stdout.strip()
+        raise RuntimeError(f"No usable Python interpreter for the local sandbox (tried: {candidates})")
+
+    def validate(self, script: str, requirements: str) -> dict:
+        with self._venv(requirements) as python_bin, tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "script.py").write_text(script)
+            result = self._run_script(python_bin, Path(tmpdir))
+            return {
+                "stdout": result.stdout,
+                "stderr": result.stderr,
+                "returncode": result.returncode
+            }
+
+    def benchmark(self, script: str, requirements: str, repeats: int = 5, warmup: int = 1, cpus: str = None,
+                  scale: float = 1, timeout: float = 300) -> dict:
+        with self._venv(requirements) as python_bin, tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "script.py").write_text(script)
+            shutil.copy(BENCH_RUNNER, Path(tmpdir) / "bench_runner.py")
+            print(f"[INFO] Benchmarking script locally ({repeats} runs, CPUs {cpus or 'unpinned'})...")
+            try:
+                # the runner pins itself (and so every timed run) with sched_setaffinity
+                result = subprocess.run(
+                    self._command(python_bin, "bench_runner.py", "script.py"),
+                    cwd=tmpdir,
+                    env={**self._script_env(), **bench_env(repeats, warmup, cpus, scale, timeout)},
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    timeout=timeout * (repeats + warmup) + 60,
+                )
+            except subprocess.TimeoutExpired as e:
+                raise RuntimeError(f"[TIMEOUT] Benchmark exceeded {e.timeout} seconds.") from e
+            return read_bench_result(result)
+
+    def environment_key(self, requirements: str) -> str:
+        # the resource limits and network access change what a script can do, not just the venv
+        return "\n\0".join(["local", self._venv_key(requirements), str(self.timeout), str(self.cpu_seconds),
+                              str(self.memory_mb), str(self.allow_network)])
+
+    def _venv_key(self, requirements: str) -> str:
+        return hashlib.sha256("\n\0".join([
+            self.interpreter_version,
+            normalize_requirements(requirements).lower(),
+        ]).encode("utf-8")).hexdigest()[:16]
+
+    @contextmanager
+    def _venv(self, requirements: str):
+        """Python of the venv for `requirements`; the venv cannot be evicted until the block exits."""
+        # marked before the existence check, so an eviction either moved the venv away before it (and it
+        # is rebuilt) or skips it
+        venv_key = str(self.venv_dir / self._venv_key(requirements))
+        with self._in_use_lock:
+            self._in_use[venv_key] += 1
+        try:
+            yield self._ensure_venv(requirements)
+        finally:
+            with self._in_use_lock:
+                self._in_use[venv_key] -= 1
+                if not self._in_use[venv_key]:
+                    del self._in_use[venv_key]
+
+    def _ensure_venv(self, requirements: str) -> Path:
+        key = self._venv_key(requirements)
+        venv_path = self.venv_dir / key
+        python_bin = venv_path / "bin" / "python"
+
+        with self._build_locks[key]:
+            if python_bin.exists():
+                print(f"[INFO] Reusing cached virtualenv: {key}")
+                os.utime(venv_path)
+                return python_bin
+
+            # build next to the final location and rename, so a crash never leaves a half-built venv behind
+            build_path = self.venv_dir / f"{key}.building"
+            shutil.rmtree(build_path, ignore_errors=True)
+            print(f"[INFO] Creating virtualenv: {key}...")
+            try:
+                subprocess.run([self.python_executable, "-m", "venv", str(build_path)],
+                               check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=300)
+                requirements_path = build_path / "requirements.txt"
+                requirements_path.write_text(requirements)
+                subprocess.run([str(build_path / "bin" / "python"), "-m", "pip", "install", "--no-cache-dir",
+                                "-r", str(requirements_path)],
+                               check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=600)
+                build_path.rename(venv_path)
+            except subprocess.CalledProcessError as e:
+                error_msg = f"[VENV BUILD FAILED]\nSTDOUT:\n{e.stdout}\nSTDERR:\n{e.stderr}"
+                print(error_msg)
+                raise RuntimeError(error_msg) from e
+            except subprocess.TimeoutExpired as e:
+                error_msg = f"[VENV BUILD FAILED]\n[TIMEOUT] `{e.cmd[2]}` exceeded {e.timeout} seconds."
+                print(error_msg)
+                raise RuntimeError(error_msg) from e
+            finally:
+                # gone after a successful rename, a partial venv otherwise
+                shutil.rmtree(build_path, ignore_errors=True)
+
+        self._evict(keep=key)
+        return python_bin
+
+    def _evict(self, keep: str):
+        venvs = []
+        for path in self.venv_dir.iterdir():
+            if path.name.endswith((".building", ".evicting")):
+                continue
+            try:
+                if path.is_dir():
+                    venvs.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue  # evicted or renamed by another thread in the meantime
+        venvs.sort()
+        for _, venv_path in venvs[:max(0, len(venvs) - self.max_venvs)]:
+            if venv_path.name == keep:
+                continue
+            # moved aside under the in-use lock, so no run can pick the venv up while it is deleted
+            trash = venv_path.with_name(f"{venv_path.name}.{uuid.uuid4().hex[:8]}.evicting")
+            with self._in_use_lock:
+                if str(venv_path) in self._in_use:
+                    continue
+                try:
+                    venv_path.rename(trash)
+                except FileNotFoundError:
+                    continue
+            shutil.rmtree(trash, ignore_errors=True)
+            print(f"[INFO] Evicted virtualenv: {venv_path.name}")
+
+    def _command(self, python_bin: Path, *args: str) -> list:
+        """Runs `python_bin args` without network access and under the CPU and memory limits."""
+        memory_bytes = self.memory_mb * 1024 * 1024
+        # absolute, the command runs from the script's directory; not resolved, that would leave the venv
+        return self._network_prefix + [sys.executable, "-c", _LIMIT_SHIM, str(self.cpu_seconds), str(memory_bytes),
+                                       str(Path(python_bin).absolute()), *args]
+
+    @staticmethod
+    def _no_network_prefix() -> list:
+        # an unprivileged network namespace has no interfaces besides a downed loopback
+        if sys.platform.startswith("linux") and shutil.which("unshare"):
+            probe = subprocess.run(["unshare", "--user", "--map-root-user", "--net", "true"],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if probe.returncode == 0:
+                return ["unshare", "--user", "--map-root-user", "--net"]
+        print("[WARN] Network namespaces are unavailable, local sandbox scripts only get a dead proxy")
+        return []
+
+    def _script_env(self) -> dict:
+        env = {
+            "PATH": os.environ.get("PATH", ""),
+            "HOME": os.environ.get("HOME", "/tmp"),
+            "LANG": os.environ.get("LANG", "C.UTF-8"),
+            "PYTHONDONTWRITEBYTECODE": "1",
+        }
+        if not self.allow_network and not self._network_prefix:
+            for var in ("http_proxy", "https_proxy", "HTTP_PROXY", "HTTPS_PROXY"):
+                env[var] = "http://127.0.0.1:9"
+        return env
+
+    def _run_script(self, python_bin: Path, workdir: Path) -> subprocess.CompletedProcess:
+        script_name = "script.py"
+        print(f"[INFO] Running script: {script_name} locally...")
+        try:
+            return subprocess.run(
+                self._command(python_bin, script_name),
+                cwd=workdir,
+                env=self._script_env(),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=self.timeout,
+            )
+        except subprocess.TimeoutExpired as e:
+            error_msg = f"[TIMEOUT] Script '{script_name}' exceeded {e.timeout} seconds."
+            print(error_msg)
+            return subprocess.CompletedProcess(
+                args=e.cmd,
+                returncode=-1,
+                stdout="",
+                stderr=error_msg
+            )
@@ -0,0 +1,323 @@
+import ast
+import json
+import re
+import sys
+import sysconfig
+import threading
+from collections import Counter
+from functools import lru_cache
+from importlib.util import find_spec
+from pathlib import Path
+
+from packaging.markers import default_environment
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.version import InvalidVersion, Version
+
+from src.validator.base import CodeValidator
+
+PACKAGES_PATH = Path(__file__).with_name("preflight_packages.json")
+
+# exception types whose handler makes the imports of a `try:` body optional
+_IMPORT_ERRORS = {"ImportError", "ModuleNotFoundError", "Exception", "BaseException"}
+# `git+https://host/org/repo@ref#egg=name` and other bare URLs pip installs without a PEP 508 name
+_URL_REQUIREMENT_RE = re.compile(r"^(?:(?:-e|--editable)\s+)?(?:[a-z]+\+)?[a-z]+://\S+$", re.IGNORECASE)
+_ARCHIVE_SUFFIX_RE = re.compile(r"(\.git|\.zip|\.tar\.gz|\.tgz|\.tar\.bz2)$")
+
+
+class PreflightError(RuntimeError):
+    """The script or its requirements cannot work; raised before any sandbox is built.
+
+    A RuntimeError like the sandbox's own environment failures, so the pipelines feed the message
+    straight into the refinement prompt.
+    """
+
+    def __init__(self, issues: list):
+        self.issues = issues
+        super().__init__("Pre-flight check failed, nothing was built or run:\n"
+                         + "\n".join(f"- {message}" for _, message in issues))
+
+
+def canonical_name(name: str) -> str:
+    # PEP 503: PyYAML, pyyaml and py_yaml are the same distribution
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+@lru_cache(maxsize=None)
+def _host_stdlib(module: str) -> bool:
+    names = getattr(sys, "stdlib_module_names", None)  # Python 3.10+
+    if names is not None:
+        return module in names
+    if module in sys.builtin_module_names:
+        return True
+    try:
+        spec = find_spec(module)
+    except (ImportError, ValueError):
+        return False
+    origin = spec.origin if spec else None
+    return bool(origin) and origin.startswith(sysconfig.get_paths()["stdlib"]) and "site-packages" not in origin
+
+
+class _ImportCollector(ast.NodeVisitor):
+    """Top-level modules a script imports unconditionally, with the line of their first import."""
+
+    def __init__(self):
+        self.required = {}
+        self._optional = 0
+
+    def visit_Try(self, node):
+        optional = any(self._catches_import_error(handler) for handler in node.handlers)
+        self._optional += optional
+        for stmt in node.body:
+            self.visit(stmt)
+        self._optional -= optional
+        for stmt in [*node.handlers, *node.orelse, *node.finalbody]:
+            self.visit(stmt)
+
+    visit_TryStar = visit_Try
+
+    def visit_If(self, node):
+        # `if TYPE_CHECKING:` imports never run
+        test = node.test
+        if isinstance(test, ast.Name) and test.id == "TYPE_CHECKING" or \
+                isinstance(test, ast.Attribute) and test.attr == "TYPE_CHECKING":
+            for stmt in node.orelse:
+                self.visit(stmt)
+            return
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._add(alias.name, node.lineno)
+
+    def visit_ImportFrom(self, node):
+        if node.level == 0 and node.module:
+            self._add(node.module, node.lineno)
+
+    def _add(self, module: str, lineno: int):
+        if not self._optional:
+            self.required.setdefault(module.split(".")[0], lineno)
+
+    @staticmethod
+    def _catches_import_error(handler: ast.ExceptHandler) -> bool:
+        if handler.type is None:
+            return True
+        types = handler.type.elts if isinstance(handler.type, ast.Tuple) else [handler.type]
+        return any(isinstance(t, ast.Name) and t.id in _IMPORT_ERRORS for t in types)
+
+
+class Preflight:
+    """Static checks of a script and its requirements.txt against the sandbox's Python version.
+
+    Catches in milliseconds what would otherwise fail a 30-120s image build or the first line of the
+    run: syntax the target Python does not accept, malformed, unpinned or conflicting requirement
+    lines, standard library modules in requirements.txt and pins to releases that dropped the target
+    Python. Package knowledge (import names, dependencies, support ranges) comes from the bundled
+    preflight_packages.json, so no index is queried; since that map cannot know every transitive
+    dependency, imports it cannot resolve are only warnings (`WARNING_KINDS`).
+    """
+
+    WARNING_KINDS = frozenset({"missing_requirement"})
+
+    def __init__(self, python_version: str = "3.8", require_pins: bool = True, packages_path: Path = PACKAGES_PATH):
+        self.python_version = ".".join(str(python_version).split(".")[:2])
+        self.target = tuple(int(part) for part in self.python_version.split("."))
+        self.require_pins = require_pins
+
+        data = json.loads(Path(packages_path).read_text(encoding="utf-8"))
+        self.import_to_package = {module: [canonical_name(name) for name in names]
+                                  for module, names in data["import_to_package"].items()}
+        self.preinstalled = {canonical_name(name) for name in data["preinstalled"]}
+        self.dependencies = {canonical_name(name): [canonical_name(dep) for dep in deps]
+                             for name, deps in data["dependencies"].items()}
+        dropped_support = data["dropped_python_support"].get(self.python_version, {})
+        self.dropped_support = {canonical_name(name): Version(version) for name, version in dropped_support.items()}
+        self.stdlib_added = {module: self._version_tuple(version) for module, version in data["stdlib_added"].items()}
+        self.stdlib_removed = {module: self._version_tuple(version)
+                               for module, version in data["stdlib_removed"].items()}
+        self.not_installable = {canonical_name(name) for name in data["not_installable"]}
+        self.marker_environment = {**default_environment(), "python_version": self.python_version,
+                                   "python_full_version": f"{self.python_version}.0"}
+
+    @staticmethod
+    def _version_tuple(version: str) -> tuple:
+        return tuple(int(part) for part in version.split("."))
+
+    def check(self, script: str, requirements: str) -> list:
+        """(kind, message) of every problem found, empty when the script may go to the sandbox."""
+        tree, issues = self.check_syntax(script or "")
+        packages, requirement_issues = self.check_requirements(requirements or "")
+        issues += requirement_issues
+        if tree is not None:
+            issues += self.check_imports(tree, packages)
+        return issues
+
+    def check_syntax(self, script: str):
+        try:
+            tree = ast.parse(script, filename="script.py", feature_version=self.target)
+            # compiling catches what the parser lets through, e.g. `return` outside a function
+            compile(tree, "script.py", "exec")
+            return tree, []
+        except SyntaxError as e:
+            line = (e.text or "").strip()
+            message = f"script.py line {e.lineno}: SyntaxError: {e.msg} (Python {self.python_version} grammar)"
+            return None, [("syntax", f"{message}\n    {line}" if line else message)]
+
+    def check_requirements(self, requirements: str):
+        """Distributions the requirements install (with their known dependencies) and the problems found."""
+        issues, pinned, opaque = [], {}, set()
+        for line in requirements.splitlines():
+            stripped = line.strip()
+            if _URL_REQUIREMENT_RE.match(stripped):
+                # pip installs these as they are; nothing to check but the name the URL most likely provides
+                name = self._url_requirement_name(stripped)
+                if name:
+                    opaque.add(name)
+                continue
+            line = re.sub(r"(^|\s)#.*$", "", line).strip()
+            if not line:
+                continue
+            if line.startswith(("-r", "-c", "--requirement", "--constraint")):
+                issues.append(("malformed", f"`{line}` refers to a file that does not exist in the sandbox"))
+                continue
+            if line.startswith("-"):
+                continue  # other pip options (e.g. --extra-index-url) are passed through
+            try:
+                requirement = Requirement(line)
+            except InvalidRequirement as e:
+                hint = " (pin with `==`)" if re.match(r"^[\w.\-\[\], ]+=[^=]", line) else ""
+                issues.append(("malformed", f"`{line}` is not a valid requirement{hint}: {str(e).splitlines()[0]}"))
+                continue
+            if requirement.marker is not None and not requirement.marker.evaluate(self.marker_environment):
+                continue
+
+            name = canonical_name(requirement.name)
+            if name in self.not_installable:
+                issues.append(("not_installable", f"`{requirement.name}` is part of the standard library and "
+                                                  f"cannot be installed with pip, remove it from requirements.txt"))
+                continue
+            if name in pinned and str(pinned[name].specifier) != str(requirement.specifier):
+                issues.append(("conflict", f"`{pinned[name]}` and `{requirement}` conflict"))
+            pinned.setdefault(name, requirement)
+            if requirement.url:
+                continue
+            if self.require_pins and not any(spec.operator in ("==", "===") for spec in requirement.specifier):
+                issues.append(("unpinned", f"`{line}` is not pinned, pin an exact version that supports "
+                                           f"Python {self.python_version} (e.g. `{requirement.name}==<version>`)"))
+            dropped = self.dropped_support.get(name)
+            if dropped is not None and self._requires_newer_python(requirement, dropped):
+                issues.append(("python_version", f"`{line}` needs a newer Python: {requirement.name} dropped Python "
+                                                 f"{self.python_version} in {dropped}, pin a release before {dropped}"))
+        return self._installed([*pinned, *opaque]), issues
+
+    @staticmethod
+    def _url_requirement_name(line: str) -> str:
+        egg = re.search(r"[#&]egg=([\w.\-]+)", line)
+        if egg:
+            return canonical_name(egg.group(1))
+        path = line.split()[-1].split("#")[0].split("?")[0].rstrip("/")
+        last = path.rsplit("/", 1)[-1]
+        if last.endswith(".whl"):
+            return canonical_name(last.split("-")[0])
+        # repo@ref, repo.git, name-1.0.tar.gz
+        last = _ARCHIVE_SUFFIX_RE.sub("", last.split("@")[0])
+        last = re.sub(r"-\d[\w.]*$", "", last)
+        return canonical_name(last) if last else None
+
+    @staticmethod
+    def _requires_newer_python(requirement: Requirement, dropped: Version) -> bool:
+        for spec in requirement.specifier:
+            if spec.operator not in ("==", "===", ">=", ">", "~="):
+                continue
+            try:
+                if Version(spec.version.rstrip(".*")) >= dropped:
+                    return True
+            except InvalidVersion:
+                continue
+        return False
+
+    def _installed(self, requirements) -> set:
+        installed, pending = set(self.preinstalled), list(requirements)
+        while pending:
+            name = pending.pop()
+            if name not in installed:
+                installed.add(name)
+                pending.extend(self.dependencies.get(name, ()))
+        return installed
+
+    def check_imports(self, tree: ast.AST, installed: set) -> list:
+        collector = _ImportCollector()
+        collector.visit(tree)
+        issues = []
+        for module, lineno in sorted(collector.required.items(), key=lambda item: item[1]):
+            if module in self.stdlib_added and self.target < self.stdlib_added[module]:
+                added = ".".join(map(str, self.stdlib_added[module]))
+                issues.append(("python_version", f"script.py line {lineno}: `{module}` is in the standard library "
+                                                 f"only from Python {added}, not {self.python_version}"))
+                continue
+            if self.is_stdlib(module) or module == "__future__":
+                continue
+            packages = self.import_to_package.get(module, [canonical_name(module)])
+            if not self._provides(packages, installed):
+                issues.append(("missing_requirement", f"script.py line {lineno}: `{module}` is imported but no "
+                                                      f"known requirement provides it, add `{packages[0]}` "
+                                                      f"(pinned) to requirements.txt unless another requirement "
+                                                      f"installs it"))
+        return issues
+
+    @staticmethod
+    def _provides(packages: list, installed: set) -> bool:
+        # `google-*` stands for every distribution of a namespace package (google-cloud-storage, ...)
+        return any(any(name.startswith(package[:-1]) for name in installed) if package.endswith("*")
+                   else package in installed for package in packages)
+
+    def is_stdlib(self, module: str) -> bool:
+        if module in self.stdlib_removed:
+            return self.target < self.stdlib_removed[module]
+        if module in self.stdlib_added:
+            return self.target >= self.stdlib_added[module]
+        return _host_stdlib(module)
+
+
+class PreflightValidator(CodeValidator):
+    """Runs the pre-flight checks before handing a script to the wrapped validator (cache, sandbox)."""
+
+    def __init__(self, validator: CodeValidator, preflight: Preflight):
+        self.validator = validator
+        self.preflight = preflight
+        self.checked = 0
+        self.rejected = 0
+        self.warned = 0
+        self.issues = Counter()
+        self._stats_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name == "validator":
+            raise AttributeError(name)
+        return getattr(self.validator, name)
+
+    def environment_key(self, requirements: str) -> str:
+        return self.validator.environment_key(requirements)
+
+    def benchmark(self, script: str, requirements: str, **kwargs) -> dict:
+        return self.validator.benchmark(script, requirements, **kwargs)
+
+    def validate(self, script: str, requirements: str) -> dict:
+        issues = self.preflight.check(script, requirements)
+        errors = [issue for issue in issues if issue[0] not in self.preflight.WARNING_KINDS]
+        with self._stats_lock:
+            self.checked += 1
+            self.rejected += bool(errors)
+            self.warned += bool(issues) and not errors
+            self.issues.update(kind for kind, _ in issues)
+        if errors:
+            raise PreflightError(errors)
+        for _, message in issues:
+            # the sandbox has the final word, e.g. on dependencies the bundled map does not know
+            print(f"[WARN] Pre-flight: {message}")
+        return self.validator.validate(script=script, requirements=requirements)
+
+    def summary(self) -> str:
+        with self._stats_lock:
+            kinds = ", ".join(f"{kind}={count}" for kind, count in self.issues.most_common())
+            return f"{self.checked} scripts checked, {self.rejected} rejected before the sandbox, " \
+                   f"{self.warned} run despite warnings" + (f" ({kinds})" if kinds else "")